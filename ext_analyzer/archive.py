@@ -0,0 +1,278 @@
+"""
+Raw HTML archive for Chrome Extension Analyzer
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config import ARCHIVE_DIR, ARCHIVE_ZSTD_LEVEL, ARCHIVE_ZLIB_LEVEL, ARCHIVE_TMP_MAX_AGE_HOURS
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to zlib, which compresses less
+    zstandard = None
+
+CAPTURE_FIELDS = ('content_hash', 'kind', 'source', 'url', 'captured_at', 'size', 'stored_size')
+
+def _compressor():
+    """
+    Create a streaming compressor, zstd if available, zlib otherwise.
+
+    Returns:
+        tuple: (compressor, file_suffix), the compressor having compress()
+               and flush() methods
+    """
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL).compressobj(), '.zst'
+    return zlib.compressobj(ARCHIVE_ZLIB_LEVEL), '.zz'
+
+def _decompress(data, suffix):
+    if suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("the zstandard package is needed to read .zst archive objects")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompress(data)
+
+class ArchiveWriter:
+    """
+    Streams one captured page into the archive.
+
+    Chunks are compressed into a temporary file as they arrive while their
+    SHA-256 is computed, so the page is never held in memory. commit()
+    stores the page (once per distinct content) and discard() drops it.
+    """
+
+    def __init__(self, archive, kind, source, url):
+        """
+        Args:
+            archive (HtmlArchive): Archive to store the page in
+            kind (str): 'report' or 'blog'
+            source (str): Extension ID or blog URL the page belongs to
+            url (str): URL the page was fetched from
+        """
+        self.archive = archive
+        self.kind = kind
+        self.source = source
+        self.url = url
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._compressor, self._suffix = _compressor()
+        self._temp_path = os.path.join(archive.path, 'tmp', f"{os.getpid()}.{threading.get_ident()}.{id(self)}.tmp")
+        self._file = open(self._temp_path, 'wb')
+
+    def write(self, data):
+        """
+        Add the next chunk of the page.
+
+        Args:
+            data (bytes): Raw page content
+        """
+        self._digest.update(data)
+        self.size += len(data)
+        self._file.write(self._compressor.compress(data))
+
+    def commit(self):
+        """
+        Store the page and record the capture.
+
+        Returns:
+            str: Hex SHA-256 of the content
+        """
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        return self.archive._store(self, self._temp_path, self._suffix, self._digest.hexdigest())
+
+    def discard(self):
+        """
+        Drop the page, e.g. because it turned out to be unchanged.
+        """
+        self._file.close()
+        os.remove(self._temp_path)
+
+class HtmlArchive:
+    """
+    Content-addressed archive of raw report and blog HTML.
+
+    Every blob is stored once, compressed, under the hex SHA-256 of its
+    bytes (objects/<2 hex digits>/<rest>.zst), so re-fetching an unchanged
+    page costs no space. Pages are compressed while they stream in. A SQLite manifest records each capture: what kind
+    of page it was, its source (extension ID or blog URL), URL and time.
+    Report blobs hash the report's UTF-8 text, so their content hash is the
+    report_hash kept by the report cache. Blobs are written to tmp/ and
+    renamed into place, so any number of threads and processes can share
+    the archive.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR):
+        """
+        Open (and create if needed) the archive.
+
+        Args:
+            path (str): Archive directory
+        """
+        self.path = path
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'tmp'), exist_ok=True)
+        self._sweep_tmp()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, 'index.db'), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS captures ('
+                ' content_hash TEXT NOT NULL,'
+                ' kind TEXT NOT NULL,'
+                ' source TEXT NOT NULL,'
+                ' url TEXT,'
+                ' captured_at REAL NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' stored_size INTEGER NOT NULL,'
+                ' PRIMARY KEY (kind, source, content_hash))'
+            )
+
+    def close(self):
+        """
+        Close the manifest database.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _sweep_tmp(self):
+        """
+        Remove temporary files left behind by processes that died mid-write.
+
+        Other processes may be writing to tmp/ right now, so only files not
+        written to for ARCHIVE_TMP_MAX_AGE_HOURS are removed.
+        """
+        cutoff = time.time() - ARCHIVE_TMP_MAX_AGE_HOURS * 3600
+        with os.scandir(os.path.join(self.path, 'tmp')) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass  # Removed by another process in the meantime
+
+    def _object_path(self, content_hash, suffix):
+        return os.path.join(self.path, 'objects', content_hash[:2], content_hash[2:] + suffix)
+
+    def _find_object(self, content_hash):
+        """
+        Find the stored object of a blob, whichever compression it used.
+
+        Returns:
+            tuple or None: (path, suffix) if stored
+        """
+        for suffix in ('.zst', '.zz'):
+            path = self._object_path(content_hash, suffix)
+            if os.path.exists(path):
+                return path, suffix
+        return None
+
+    def open_writer(self, kind, source, url):
+        """
+        Start archiving a captured page that is read in chunks.
+
+        Args:
+            kind (str): 'report' or 'blog'
+            source (str): Extension ID or blog URL the page belongs to
+            url (str): URL the page was fetched from
+
+        Returns:
+            ArchiveWriter: Writer to stream the raw page content to
+        """
+        return ArchiveWriter(self, kind, source, url)
+
+    def put(self, kind, source, url, data):
+        """
+        Archive a captured page.
+
+        Args:
+            kind (str): 'report' or 'blog'
+            source (str): Extension ID or blog URL the page belongs to
+            url (str): URL the page was fetched from
+            data (bytes): Raw page content
+
+        Returns:
+            str: Hex SHA-256 of the content
+        """
+        writer = self.open_writer(kind, source, url)
+        writer.write(data)
+        return writer.commit()
+
+    def _store(self, writer, temp_path, suffix, content_hash):
+        """
+        Move a compressed page written by an ArchiveWriter into place.
+
+        Returns:
+            str: Hex SHA-256 of the content
+        """
+        found = self._find_object(content_hash)
+        if found is not None:
+            os.remove(temp_path)  # Already archived
+            stored_size = os.path.getsize(found[0])
+        else:
+            path = self._object_path(content_hash, suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            stored_size = os.path.getsize(path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT OR IGNORE INTO captures ({", ".join(CAPTURE_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (content_hash, writer.kind, writer.source, writer.url, time.time(), writer.size, stored_size)
+            )
+        return content_hash
+
+    def contains(self, content_hash):
+        """
+        Check if a blob is archived.
+
+        Args:
+            content_hash (str): Hex SHA-256 of the content
+
+        Returns:
+            bool: True if the blob is stored
+        """
+        return self._find_object(content_hash) is not None
+
+    def get(self, content_hash):
+        """
+        Read an archived blob.
+
+        Args:
+            content_hash (str): Hex SHA-256 of the content
+
+        Returns:
+            bytes or None: Raw content, or None if it is not archived
+        """
+        found = self._find_object(content_hash)
+        if found is None:
+            return None
+        path, suffix = found
+        with open(path, 'rb') as f:
+            return _decompress(f.read(), suffix)
+
+    def captures(self, kind, sources=None):
+        """
+        List the captures of one kind of page.
+
+        Args:
+            kind (str): 'report' or 'blog'
+            sources (list): Only list these extension IDs or blog URLs (optional)
+
+        Returns:
+            list: Capture dictionaries with the CAPTURE_FIELDS keys, by
+                  source and then capture time
+        """
+        query = f'SELECT {", ".join(CAPTURE_FIELDS)} FROM captures WHERE kind = ?'
+        params = [kind]
+        if sources is not None:
+            query += f' AND source IN ({", ".join("?" for _ in sources)})'
+            params.extend(sources)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY source, captured_at', params).fetchall()
+        return [dict(zip(CAPTURE_FIELDS, row)) for row in rows]
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for Chrome Extension Analyzer
+
+Serves the recorded report, Chrome Web Store and blog pages in fixtures/
+from a local HTTP server that stands in for dex.koi.security, the Chrome
+Web Store and the blogs, with configurable latency and error rate. The
+analyzer is measured end to end (main) and stage by stage (make_request,
+extract_information, check_chrome_store_status); every benchmark runs in
+its own process so its peak RSS can be reported. Results can be saved and
+compared across versions.
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+STAGES = ('make_request', 'extract_information', 'check_chrome_store_status', 'main')
+REPORT_VERSION = '1.0.0'  # Version the stand-in redirects report URLs to
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """
+    Load the recorded pages served by the stand-in server.
+
+    Args:
+        fixtures_dir (str): Directory holding reports/, store/ and blogs/
+
+    Returns:
+        dict: 'reports' (list of report pages), 'store' (listed and
+              unavailable pages) and 'blogs' (blog pages keyed by name),
+              all as bytes
+    """
+    def read(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    return {
+        'reports': [read(path) for path in sorted(glob.glob(os.path.join(fixtures_dir, 'reports', '*.html')))],
+        'store': {
+            'listed': read(os.path.join(fixtures_dir, 'store', 'listed.html')),
+            'unavailable': read(os.path.join(fixtures_dir, 'store', 'unavailable.html'))
+        },
+        'blogs': {
+            os.path.splitext(os.path.basename(path))[0]: read(path)
+            for path in sorted(glob.glob(os.path.join(fixtures_dir, 'blogs', '*.html')))
+        }
+    }
+
+def make_extension_ids(count):
+    """
+    Generate deterministic, valid extension IDs.
+
+    Args:
+        count (int): Number of IDs
+
+    Returns:
+        list: Extension IDs, using the a-p alphabet of real Chrome IDs
+    """
+    table = str.maketrans('0123456789abcdef', 'abcdefghijklmnop')
+    return [hashlib.md5(str(index).encode()).hexdigest().translate(table) for index in range(count)]
+
+def _pick(extension_id, choices):
+    """
+    Pick a fixture for an extension ID, the same one on every request.
+    """
+    return choices[int(hashlib.md5(extension_id.encode()).hexdigest(), 16) % len(choices)]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving fixtures in place of the live sites.
+
+    Routes:
+        /reports/chrome/<id>            redirect to the versioned report URL
+        /reports/chrome/<id>/<version>  a recorded report
+        /detail/<id>                    a listed or unavailable store page
+        /blogs/<name>                   a recorded blog page
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are written separately
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            self._send(503, b'Service Unavailable')
+            return
+
+        parts = self.path.strip('/').split('/')
+        fixtures = server.fixtures
+        if parts[:2] == ['reports', 'chrome'] and len(parts) == 3:
+            self.send_response(302)
+            self.send_header('Location', f"/reports/chrome/{parts[2]}/{REPORT_VERSION}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif parts[:2] == ['reports', 'chrome'] and len(parts) == 4:
+            self._send(200, _pick(parts[2], fixtures['reports']))
+        elif parts[0] == 'detail' and len(parts) == 2:
+            store = fixtures['store']
+            self._send(200, _pick(parts[1], [store['listed'], store['listed'], store['unavailable']]))
+        elif parts[0] == 'blogs' and len(parts) == 2 and parts[1] in fixtures['blogs']:
+            self._send(200, fixtures['blogs'][parts[1]])
+        else:
+            self._send(404, b'Not Found')
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(latency_ms=0.0, error_rate=0.0):
+    """
+    Start the stand-in server on a free local port.
+
+    Args:
+        latency_ms (float): Delay added to every response
+        error_rate (float): Fraction of requests answered with HTTP 503
+
+    Returns:
+        ThreadingHTTPServer: Running server, stop it with shutdown()
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.error_rate = error_rate
+    server.fixtures = load_fixtures()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of sorted values.
+
+    Args:
+        sorted_values (list): Values in ascending order
+        percent (float): Percentile between 0 and 100
+
+    Returns:
+        float or None: Percentile value, or None if there are no values
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size of this process, or of its largest child.
+
+    Args:
+        children (bool): Measure the largest finished child process (such as
+                         a parser process of main) instead of this process
+
+    Returns:
+        float or None: Peak RSS in MB, or None where it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _timed_calls(function, items):
+    """
+    Call function on every item, timing each call.
+
+    Returns:
+        list: Latency of each call in milliseconds
+    """
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def run_stage(stage, extension_ids, args):
+    """
+    Run one benchmark stage in this process.
+
+    Args:
+        stage (str): One of STAGES
+        extension_ids (list): Extension IDs to look up
+        args (Namespace): Parsed command line arguments
+
+    Returns:
+        dict: 'ids', 'seconds' and 'latencies_ms' (per call, empty for main)
+    """
+    # Both stand-in hosts get the benchmark's own limits instead of the
+    # defaults meant for the live sites
+    import config
+    for host in ('127.0.0.1', 'localhost'):
+        config.HOST_RATE_LIMITS[host] = args.rate
+        config.HOST_CONCURRENCY[host] = args.workers
+
+    # Imports and fixture loading happen before the clock starts
+    if stage == 'make_request':
+        from scraper import make_request
+        call = lambda ext_id: make_request(f"{config.DEX_REPORT_BASE_URL}{ext_id}").content
+    elif stage == 'extract_information':
+        from parser import extract_information
+        reports = [report.decode('utf-8') for report in load_fixtures()['reports']]
+        extract_information(reports[0])  # Keep the one-off BeautifulSoup import out of the timings
+        call = lambda ext_id: extract_information(_pick(ext_id, reports))
+    elif stage == 'check_chrome_store_status':
+        from scraper import check_chrome_store_status
+        call = check_chrome_store_status
+    else:
+        import main
+        with open('ids.txt', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(extension_ids) + '\n')
+        with open('feeds.json', 'w', encoding='utf-8') as f:
+            json.dump({'feeds': [f"{args.blog_base_url}{name}" for name in load_fixtures()['blogs']]}, f)
+        sys.argv = ['main.py', '--input', 'ids.txt', '--feeds', 'feeds.json', '--no-cache',
+                    '--format', 'jsonl', '--output', 'results.jsonl', '--workers', str(args.workers)]
+        if args.parsers is not None:
+            sys.argv += ['--parsers', str(args.parsers)]
+        call = None
+
+    latencies = []
+    start = time.perf_counter()
+    if call is not None:
+        latencies = _timed_calls(call, extension_ids)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.main()
+
+    return {
+        'ids': len(extension_ids),
+        'seconds': time.perf_counter() - start,
+        'latencies_ms': latencies
+    }
+
+def summarize(stage, run):
+    """
+    Reduce a stage run to the reported figures.
+
+    Returns:
+        dict: Stage name, IDs, IDs/sec, p50/p99 latency and peak RSS of the
+              stage process and of its largest child process
+    """
+    latencies = sorted(run['latencies_ms'])
+    return {
+        'stage': stage,
+        'ids': run['ids'],
+        'ids_per_sec': run['ids'] / run['seconds'] if run['seconds'] else None,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'peak_rss_mb': run.get('peak_rss_mb'),
+        'child_peak_rss_mb': run.get('child_peak_rss_mb')
+    }
+
+def run_stage_process(stage, args, server):
+    """
+    Run a stage in a fresh interpreter pointed at the stand-in server.
+
+    Args:
+        stage (str): One of STAGES
+        args (Namespace): Parsed command line arguments
+        server (ThreadingHTTPServer): Running stand-in server
+
+    Returns:
+        dict: Summary from summarize, or None if the stage failed
+    """
+    port = server.server_address[1]
+    env = dict(os.environ,
+               EXT_ANALYZER_DEX_URL=f"http://127.0.0.1:{port}/reports/chrome/",
+               # A second host name, so dex and store get separate per-host limits
+               EXT_ANALYZER_STORE_URL=f"http://localhost:{port}/detail/")
+    command = [sys.executable, os.path.abspath(__file__), '--child', stage,
+               '--ids', str(args.ids), '--workers', str(args.workers), '--rate', str(args.rate),
+               '--blog-base-url', f"http://127.0.0.1:{port}/blogs/"]
+    if args.parsers is not None:
+        command += ['--parsers', str(args.parsers)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # main's caches and output files are created in the working directory
+        completed = subprocess.run(command, env=env, cwd=workdir, capture_output=True, text=True)
+
+    if completed.returncode != 0:
+        print(f"  Error running {stage}: {completed.stderr.strip().splitlines()[-1:]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_version():
+    """
+    Describe the checked-out version.
+
+    Returns:
+        str: Output of git describe, or 'unknown' outside a git checkout
+    """
+    try:
+        completed = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return 'unknown'
+    return completed.stdout.strip() or 'unknown'
+
+def _format_number(value, pattern):
+    return '-' if value is None else pattern.format(value)
+
+def print_results(results):
+    """
+    Print stage summaries as a table.
+
+    Args:
+        results (list): Summaries from summarize
+    """
+    print(f"  {'stage':<27} {'ids':>6} {'ids/sec':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12}"
+          f" {'child RSS MB':>13}")
+    for result in results:
+        print(f"  {result['stage']:<27} {result['ids']:>6} "
+              f"{_format_number(result['ids_per_sec'], '{:.1f}'):>9} "
+              f"{_format_number(result['p50_ms'], '{:.2f}'):>8} "
+              f"{_format_number(result['p99_ms'], '{:.2f}'):>8} "
+              f"{_format_number(result['peak_rss_mb'], '{:.1f}'):>12} "
+              f"{_format_number(result.get('child_peak_rss_mb'), '{:.1f}'):>13}")
+
+def print_saved_runs(path):
+    """
+    Print every run saved in a results file, oldest first.
+
+    Args:
+        path (str): JSON Lines file written with --save
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            run = json.loads(line)
+            params = run['params']
+            print(f"\n{run['version']} at {run['timestamp']} "
+                  f"(ids={params['ids']}, workers={params['workers']}, "
+                  f"latency={params['latency_ms']}ms, error rate={params['error_rate']})")
+            print_results(run['results'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analyzer against a local stand-in server')
+    parser.add_argument('--stage', choices=STAGES + ('all',), default='all',
+                       help='Stage to benchmark (default: all)')
+    parser.add_argument('--ids', type=int, default=200, help='Number of extension IDs (default: 200)')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='Concurrent lookups for main, and per-host limit (default: 8)')
+    parser.add_argument('--parsers', type=int,
+                       help="Parser processes used by main (default: main's own default)")
+    parser.add_argument('--rate', type=float, default=1000.0,
+                       help='Requests per second allowed per stand-in host (default: 1000)')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                       help='Delay added to every stand-in response (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with HTTP 503 (default: 0)')
+    parser.add_argument('--save', help='Append the results to this JSON Lines file')
+    parser.add_argument('--compare', help='Print the runs saved in this file and exit')
+    parser.add_argument('--child', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--blog-base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        print_saved_runs(args.compare)
+        return
+
+    if args.child:
+        run = run_stage(args.child, make_extension_ids(args.ids), args)
+        run['peak_rss_mb'] = peak_rss_mb()
+        # Parser processes have been joined by now, so they are counted here
+        run['child_peak_rss_mb'] = peak_rss_mb(children=True)
+        print(json.dumps(summarize(args.child, run)))
+        return
+
+    server = start_server(args.latency_ms, args.error_rate)
+    stages = STAGES if args.stage == 'all' else (args.stage,)
+
+    print(f"Benchmarking {git_version()} with {args.ids} IDs "
+          f"(latency {args.latency_ms}ms, error rate {args.error_rate})...")
+    results = []
+    try:
+        for stage in stages:
+            result = run_stage_process(stage, args, server)
+            if result is not None:
+                results.append(result)
+    finally:
+        server.shutdown()
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'version': git_version(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'params': {
+                    'ids': args.ids,
+                    'workers': args.workers,
+                    'latency_ms': args.latency_ms,
+                    'error_rate': args.error_rate
+                },
+                'results': results
+            }) + '\n')
+        print(f"\nResults saved to {args.save}")
+
+if __name__ == "__main__":
+    main()
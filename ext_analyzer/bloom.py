@@ -0,0 +1,134 @@
+"""
+Bloom filter for Chrome Extension Analyzer
+"""
+
+import hashlib
+import math
+import os
+import re
+import struct
+
+BLOOM_MAGIC = b'EXTBLOOM'
+BLOOM_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sIIQ64s')  # magic, version, hash count, bit count, fingerprint
+
+_CHROME_ID = re.compile(r'[a-p]{32}')
+_CHROME_ID_TO_HEX = str.maketrans('abcdefghijklmnop', '0123456789abcdef')
+
+def _id_hash(extension_id):
+    """
+    Map an extension ID to a uniformly distributed 128-bit integer.
+
+    Chrome derives extension IDs from a SHA-256 of the extension's public
+    key, spelling the hex digits with the letters a-p, so a real ID already
+    is a hash and only needs translating back. Anything else is hashed.
+    """
+    if _CHROME_ID.fullmatch(extension_id):
+        return int(extension_id.translate(_CHROME_ID_TO_HEX), 16)
+    return int.from_bytes(hashlib.blake2b(extension_id.encode('utf-8'), digest_size=16).digest(), 'little')
+
+class BloomFilter:
+    """
+    Compact probabilistic set of extension IDs.
+
+    Membership tests have no false negatives and a false positive rate set
+    at construction. Bit positions come from double hashing of the 128-bit
+    ID hash. The filter carries a fingerprint of the data it was built
+    from, so a stale filter file can be detected.
+    """
+
+    def __init__(self, bit_count, hash_count, fingerprint='', bits=None):
+        """
+        Args:
+            bit_count (int): Size of the bit array
+            hash_count (int): Bit positions set per ID
+            fingerprint (str): Identifies the data the filter was built from
+            bits (bytearray): Existing bit array (optional)
+        """
+        self.bit_count = max(8, bit_count)
+        self.hash_count = max(1, hash_count)
+        self.fingerprint = fingerprint
+        self.bits = bits if bits is not None else bytearray((self.bit_count + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate, fingerprint=''):
+        """
+        Create an empty filter sized for a number of IDs.
+
+        Args:
+            capacity (int): Number of IDs that will be added
+            error_rate (float): Target false positive rate
+            fingerprint (str): Identifies the data the filter is built from
+
+        Returns:
+            BloomFilter: Empty filter
+        """
+        capacity = max(1, capacity)
+        bit_count = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        hash_count = round(bit_count / capacity * math.log(2))
+        return cls(bit_count, hash_count, fingerprint)
+
+    def _positions(self, extension_id):
+        value = _id_hash(extension_id)
+        first = value & 0xFFFFFFFFFFFFFFFF
+        step = (value >> 64) | 1
+        bit_count = self.bit_count
+        return [(first + i * step) % bit_count for i in range(self.hash_count)]
+
+    def add(self, extension_id):
+        """
+        Add an extension ID.
+
+        Args:
+            extension_id (str): Chrome extension ID
+        """
+        bits = self.bits
+        for position in self._positions(extension_id):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, extension_id):
+        bits = self.bits
+        for position in self._positions(extension_id):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        """
+        Write the filter atomically (temporary file plus rename).
+
+        Args:
+            path (str): Filter file
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(BLOOM_MAGIC, BLOOM_FORMAT_VERSION, self.hash_count, self.bit_count,
+                                 self.fingerprint.encode('ascii')))
+            f.write(self.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a filter written by save.
+
+        Args:
+            path (str): Filter file
+
+        Returns:
+            BloomFilter or None: The filter, or None if the file is missing,
+                                 truncated or of another format version
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                bits = bytearray(f.read())
+        except OSError:
+            return None
+
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, hash_count, bit_count, fingerprint = _HEADER.unpack(header)
+        if magic != BLOOM_MAGIC or version != BLOOM_FORMAT_VERSION or len(bits) != (bit_count + 7) // 8:
+            return None
+        return cls(bit_count, hash_count, fingerprint.rstrip(b'\0').decode('ascii'), bits)
@@ -2,69 +2,346 @@
 Cache management for Chrome Extension Analyzer
 """
 
+import hashlib
 import json
-import os
+import sqlite3
+import struct
+import threading
 import time
+from collections.abc import Mapping
+from contextlib import contextmanager
 from config import CACHE_FILE, CACHE_EXPIRY_HOURS
 
-def load_cache():
+try:
+    import fcntl
+except ImportError:  # Windows: feed refreshes are not serialized between processes
+    fcntl = None
+
+FEED_FIELDS = ('checked_at', 'etag', 'last_modified', 'content_hash', 'id_count')
+
+FEED_STATS_FIELDS = ('fetched_at', 'status', 'latency_ms', 'bytes', 'ids_found', 'error',
+                     'fetch_count', 'error_count')
+
+def pack_offsets(offsets):
     """
-    Load cached blog data if it exists and is fresh.
+    Encode match offsets compactly.
+
+    Args:
+        offsets (list): Character offsets
 
     Returns:
-        dict or None: Cache data if fresh, None otherwise
+        bytes: Offsets as little-endian unsigned 32-bit integers
     """
-    if not os.path.exists(CACHE_FILE):
-        return None
+    return struct.pack(f'<{len(offsets)}I', *offsets)
 
-    try:
-        with open(CACHE_FILE, 'r') as f:
-            cache_data = json.load(f)
+def unpack_offsets(data):
+    """
+    Decode match offsets stored by pack_offsets.
 
-        # Check if cache is still fresh
-        cache_time = cache_data.get('timestamp', 0)
-        current_time = time.time()
-        if current_time - cache_time > CACHE_EXPIRY_HOURS * 3600:
-            return None
+    Args:
+        data (bytes or str): Packed offsets, or a JSON list written by
+                             older versions
 
-        return cache_data
-    except (json.JSONDecodeError, KeyError):
-        return None
+    Returns:
+        list: Character offsets
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    return list(struct.unpack(f'<{len(data) // 4}I', data))
 
-def save_cache(extension_sources):
+def is_feed_fresh(feed, refresh_hours=CACHE_EXPIRY_HOURS):
     """
-    Save extension sources to cache file.
+    Check if a feed record was checked recently enough to skip revalidation.
 
     Args:
-        extension_sources (dict): Extension sources data to cache
-    """
-    cache_data = {
-        'timestamp': time.time(),
-        'extension_sources': extension_sources
-    }
-
-    try:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache_data, f, indent=2)
-    except IOError:
-        pass  # Silently fail if we can't write cache
-
-def is_cache_fresh():
-    """
-    Check if cache file exists and is fresh.
+        feed (dict): Feed record, or None
+        refresh_hours (float): Refresh interval of the feed
 
     Returns:
-        bool: True if cache is fresh, False otherwise
+        bool: True if the feed is fresh, False otherwise
     """
-    if not os.path.exists(CACHE_FILE):
+    if not feed:
         return False
 
-    try:
-        with open(CACHE_FILE, 'r') as f:
-            cache_data = json.load(f)
+    checked_at = feed.get('checked_at', 0)
+    return time.time() - checked_at <= refresh_hours * 3600
 
-        cache_time = cache_data.get('timestamp', 0)
-        current_time = time.time()
-        return current_time - cache_time <= CACHE_EXPIRY_HOURS * 3600
-    except (json.JSONDecodeError, KeyError):
-        return False
+class BlogCache:
+    """
+    SQLite-backed blog intelligence cache.
+
+    Each feed has one record holding its validators and last check time,
+    and an inverted index maps every extension ID to the feeds it was found
+    in (with the match offsets for provenance). A feed's record and its
+    index entries are replaced together in one transaction, so an update
+    touches only that feed and lookups never load the whole mapping.
+    Any number of analyzer processes can share the database; refresh_lock
+    keeps them from refreshing the same feeds at the same time.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        """
+        Open (and create if needed) the cache database.
+
+        Args:
+            path (str): SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS feeds ('
+                ' feed_url TEXT PRIMARY KEY,'
+                ' checked_at REAL NOT NULL,'
+                ' etag TEXT,'
+                ' last_modified TEXT,'
+                ' content_hash TEXT,'
+                ' id_count INTEGER NOT NULL DEFAULT 0)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS feed_ids ('
+                ' extension_id TEXT NOT NULL,'
+                ' feed_url TEXT NOT NULL,'
+                ' offsets BLOB NOT NULL,'
+                ' PRIMARY KEY (extension_id, feed_url)) WITHOUT ROWID'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS feed_ids_by_feed ON feed_ids (feed_url)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS feed_stats ('
+                ' feed_url TEXT PRIMARY KEY,'
+                ' fetched_at REAL NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' latency_ms REAL,'
+                ' bytes INTEGER,'
+                ' ids_found INTEGER,'
+                ' error TEXT,'
+                ' fetch_count INTEGER NOT NULL DEFAULT 0,'
+                ' error_count INTEGER NOT NULL DEFAULT 0)'
+            )
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def refresh_lock(self):
+        """
+        Hold the cross-process feed refresh lock.
+
+        The lock is an exclusive flock on a file next to the database.
+        Another process refreshing feeds makes this wait until it is done;
+        callers should then re-read the feed records, since the feeds may
+        no longer be due.
+        """
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_feeds(self, feed_urls):
+        """
+        Get the records of several feeds.
+
+        Args:
+            feed_urls (list): Blog URLs
+
+        Returns:
+            dict: Feed records keyed by blog URL, for feeds that have one
+        """
+        feeds = {}
+        with self._lock:
+            for feed_url in feed_urls:
+                row = self._conn.execute(
+                    f'SELECT {", ".join(FEED_FIELDS)} FROM feeds WHERE feed_url = ?', (feed_url,)
+                ).fetchone()
+                if row is not None:
+                    feeds[feed_url] = dict(zip(FEED_FIELDS, row))
+        return feeds
+
+    def update_feed(self, feed_url, feed, offsets=None):
+        """
+        Store a feed record and, if given, replace the feed's index entries.
+
+        Args:
+            feed_url (str): Blog URL
+            feed (dict): Feed record with the FEED_FIELDS keys
+            offsets (dict): Extension ID -> match offsets found in the feed,
+                            or None to keep the indexed IDs (feed unchanged)
+        """
+        record = {field: feed.get(field) for field in FEED_FIELDS}
+        if offsets is not None:
+            record['id_count'] = len(offsets)
+        record['id_count'] = record['id_count'] or 0
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO feeds (feed_url, {", ".join(FEED_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)',
+                (feed_url,) + tuple(record[field] for field in FEED_FIELDS)
+            )
+            if offsets is not None:
+                self._conn.execute('DELETE FROM feed_ids WHERE feed_url = ?', (feed_url,))
+                self._conn.executemany(
+                    'INSERT INTO feed_ids (extension_id, feed_url, offsets) VALUES (?, ?, ?)',
+                    ((ext_id, feed_url, pack_offsets(ext_offsets)) for ext_id, ext_offsets in offsets.items())
+                )
+
+    def record_feed_stats(self, feed_url, status, latency_ms, bytes_read=None, ids_found=None, error=None):
+        """
+        Record the outcome of a feed fetch.
+
+        Args:
+            feed_url (str): Blog URL
+            status (str): 'changed', 'unchanged' or 'error'
+            latency_ms (float): Time taken by the fetch
+            bytes_read (int): Bytes downloaded
+            ids_found (int): Extension IDs found in the feed
+            error (str): Error message if the fetch failed
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO feed_stats (feed_url, fetched_at, status, latency_ms, bytes, ids_found, error,'
+                ' fetch_count, error_count) VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?) '
+                'ON CONFLICT (feed_url) DO UPDATE SET fetched_at = excluded.fetched_at,'
+                ' status = excluded.status, latency_ms = excluded.latency_ms, bytes = excluded.bytes,'
+                ' ids_found = excluded.ids_found, error = excluded.error,'
+                ' fetch_count = fetch_count + 1, error_count = error_count + excluded.error_count',
+                (feed_url, time.time(), status, latency_ms, bytes_read, ids_found, error,
+                 1 if status == 'error' else 0)
+            )
+
+    def get_feed_stats(self, feed_urls):
+        """
+        Get the fetch statistics of several feeds.
+
+        Args:
+            feed_urls (list): Blog URLs
+
+        Returns:
+            dict: Statistics keyed by blog URL, for feeds fetched at least once
+        """
+        stats = {}
+        with self._lock:
+            for feed_url in feed_urls:
+                row = self._conn.execute(
+                    f'SELECT {", ".join(FEED_STATS_FIELDS)} FROM feed_stats WHERE feed_url = ?', (feed_url,)
+                ).fetchone()
+                if row is not None:
+                    stats[feed_url] = dict(zip(FEED_STATS_FIELDS, row))
+        return stats
+
+    def prune_feeds(self, feed_urls):
+        """
+        Remove feeds that are no longer configured, with their index entries.
+
+        Args:
+            feed_urls (list): Blog URLs to keep
+        """
+        placeholders = ', '.join('?' for _ in feed_urls)
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM feeds WHERE feed_url NOT IN ({placeholders})', tuple(feed_urls))
+            self._conn.execute(f'DELETE FROM feed_ids WHERE feed_url NOT IN ({placeholders})', tuple(feed_urls))
+            self._conn.execute(f'DELETE FROM feed_stats WHERE feed_url NOT IN ({placeholders})', tuple(feed_urls))
+
+    def lookup(self, extension_id):
+        """
+        Get the feeds an extension ID was found in.
+
+        Args:
+            extension_id (str): Chrome extension ID
+
+        Returns:
+            dict: Blog URL -> list of match offsets
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT feed_url, offsets FROM feed_ids WHERE extension_id = ?', (extension_id,)
+            ).fetchall()
+        return {feed_url: unpack_offsets(offsets) for feed_url, offsets in rows}
+
+    def count_extension_ids(self):
+        """
+        Count the distinct extension IDs in the index.
+
+        Returns:
+            int: Number of extension IDs
+        """
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(DISTINCT extension_id) FROM feed_ids').fetchone()[0]
+
+    def iter_extension_ids(self):
+        """
+        Iterate over the distinct extension IDs in the index.
+
+        Yields:
+            str: Extension IDs, in sorted order
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT extension_id FROM feed_ids ORDER BY extension_id').fetchall()
+        for (extension_id,) in rows:
+            yield extension_id
+
+    def index_fingerprint(self):
+        """
+        Fingerprint the contents of the index.
+
+        The fingerprint changes whenever a feed is added, removed or
+        rescanned with different content, so data derived from the index
+        (such as the triage Bloom filter) can tell when it is stale.
+
+        Returns:
+            str: Hex SHA-256 over every feed's URL, content hash and ID count
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT feed_url, content_hash, id_count FROM feeds ORDER BY feed_url'
+            ).fetchall()
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(json.dumps(row).encode('utf-8'))
+        return digest.hexdigest()
+
+    def extension_sources(self, feed_urls):
+        """
+        Get a read-only ID -> source blogs mapping backed by the index.
+
+        Args:
+            feed_urls (list): Blog URLs to include, in the order to list them
+
+        Returns:
+            ExtensionSources: Mapping of extension ID to list of blog URLs
+        """
+        return ExtensionSources(self, feed_urls)
+
+class ExtensionSources(Mapping):
+    """
+    Lazy mapping of extension ID to the blogs it was found in.
+
+    Drop-in replacement for the plain dict the output functions expect;
+    every lookup is answered by the BlogCache index.
+    """
+
+    def __init__(self, blog_cache, feed_urls):
+        self.blog_cache = blog_cache
+        self.feed_urls = list(feed_urls)
+
+    def __getitem__(self, extension_id):
+        found = self.blog_cache.lookup(extension_id)
+        sources = [feed_url for feed_url in self.feed_urls if feed_url in found]
+        if not sources:
+            raise KeyError(extension_id)
+        return sources
+
+    def __iter__(self):
+        return self.blog_cache.iter_extension_ids()
+
+    def __len__(self):
+        return self.blog_cache.count_extension_ids()
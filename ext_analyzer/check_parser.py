@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Parser regression check for Chrome Extension Analyzer
+
+Runs extract_information over the report corpus in fixtures/reports and
+compares every result with the expected output stored next to each HTML
+file (same name, .json extension).
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from parser import extract_information
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'reports')
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """
+    Load the report corpus.
+
+    Args:
+        corpus_dir (str): Directory holding *.html reports and *.json expectations
+
+    Returns:
+        list: (name, html_content, expected_path) tuples, sorted by name
+    """
+    corpus = []
+    for html_path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+        with open(html_path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        name = os.path.splitext(os.path.basename(html_path))[0]
+        corpus.append((name, html_content, os.path.splitext(html_path)[0] + '.json'))
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description='Check extract_information against the report corpus')
+    parser.add_argument('--backend', help='BeautifulSoup backend to check (default: PARSER_BACKEND)')
+    parser.add_argument('--update', action='store_true',
+                       help='Rewrite the expected outputs from the current parser')
+    args = parser.parse_args()
+
+    failures = 0
+
+    for name, html_content, expected_path in load_corpus():
+        start = time.perf_counter()
+        extracted_data = extract_information(html_content, backend=args.backend)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if args.update:
+            with open(expected_path, 'w', encoding='utf-8') as f:
+                json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            print(f"  Updated: {name}")
+            continue
+
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+
+        # Compare as item lists so key order (which drives text output) is checked too
+        if list(extracted_data.items()) == list(expected.items()):
+            print(f"  OK:      {name} ({elapsed_ms:.1f} ms)")
+        else:
+            failures += 1
+            print(f"  FAILED:  {name}")
+            for key in sorted(set(expected) | set(extracted_data)):
+                if expected.get(key) != extracted_data.get(key):
+                    print(f"    {key}:")
+                    print(f"      expected: {expected.get(key)!r}")
+                    print(f"      actual:   {extracted_data.get(key)!r}")
+
+    if failures:
+        print(f"\n{failures} report(s) differ from the expected output.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
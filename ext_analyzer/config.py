@@ -4,16 +4,71 @@ Configuration constants for Chrome Extension Analyzer
 
 import os
 
-# Blog URLs to parse for extension IDs
+# Blog URLs to parse for extension IDs, used when FEEDS_FILE does not exist
 BLOG_URLS = [
     "https://www.koi.security/blog/google-and-microsoft-trusted-them-2-3-million-users-installed-them-they-were-malware",
     "https://www.malwarebytes.com/blog/news/2025/07/millions-of-people-spied-on-by-malicious-browser-extensions-in-chrome-and-edge",
     "https://www.esentire.com/security-advisories/reddirection-browser-extension-campaign"
 ]
 
+# Report and Chrome Web Store locations; the environment variables let the
+# benchmark (bench.py) point the analyzer at a local stand-in server
+DEX_REPORT_BASE_URL = os.environ.get('EXT_ANALYZER_DEX_URL', "https://dex.koi.security/reports/chrome/")
+CHROME_STORE_BASE_URL = os.environ.get('EXT_ANALYZER_STORE_URL', "https://chromewebstore.google.com/detail/")
+
+# Intelligence feed settings
+FEEDS_FILE = "feeds.json"  # Feed list with per-feed priority and refresh interval
+FEED_CONCURRENCY = 16  # Feeds fetched at once
+FEED_DOMAIN_CONCURRENCY = 2  # Feeds fetched at once from the same domain
+
 # Cache settings
-CACHE_FILE = "blog_cache.json"
-CACHE_EXPIRY_HOURS = 24
+CACHE_FILE = "blog_cache.db"
+CACHE_EXPIRY_HOURS = 24  # Default feed refresh interval
+
+# Inventory triage (--triage): Bloom filter of the indexed extension IDs,
+# rebuilt whenever the blog index changes
+BLOOM_FILE = "known_ids.bloom"
+BLOOM_ERROR_RATE = 0.001  # False positives are confirmed against the index
+TRIAGE_CHUNK_SIZE = 4 * 1024 * 1024  # Inventory bytes scanned at a time
+TRIAGE_SCREENED_LIMIT = 1000000  # Distinct IDs remembered as already screened
+
+# Browser profile harvesting (--harvest): user data directories relative
+# to a home directory (Linux, macOS and Windows layouts)
+HARVEST_BROWSER_PATHS = {
+    'Chrome': ['.config/google-chrome', 'Library/Application Support/Google/Chrome',
+               'AppData/Local/Google/Chrome/User Data'],
+    'Chrome Beta': ['.config/google-chrome-beta', 'Library/Application Support/Google/Chrome Beta',
+                    'AppData/Local/Google/Chrome Beta/User Data'],
+    'Chromium': ['.config/chromium', 'snap/chromium/common/chromium', 'Library/Application Support/Chromium',
+                 'AppData/Local/Chromium/User Data'],
+    'Edge': ['.config/microsoft-edge', 'Library/Application Support/Microsoft Edge',
+             'AppData/Local/Microsoft/Edge/User Data']
+}
+HARVEST_WORKERS = 16  # Directories scanned at once
+HARVEST_MAX_DEPTH = 2  # Directory levels searched for homes below a root
+HARVEST_SKIP_LOCATIONS = (5, 10)  # Component extensions bundled with the browser
+
+# Raw HTML archive: reports and blogs stored compressed by content hash
+ARCHIVE_DIR = "archive"
+# Compression runs in the lookup and feed threads, so the levels favour speed:
+# zstd 10 compresses a report in about 2 ms (level 19 takes 20 times longer)
+ARCHIVE_ZSTD_LEVEL = 10  # Used when the optional zstandard package is installed
+ARCHIVE_ZLIB_LEVEL = 6  # Fallback without zstandard
+# Temporary files of pages still being written are updated with every chunk,
+# so older ones were left behind by a process that died mid-write
+ARCHIVE_TMP_MAX_AGE_HOURS = 1
+
+# Report cache settings (per record type time-to-live)
+REPORT_CACHE_FILE = "report_cache.db"
+REPORT_CACHE_TTL_HOURS = {
+    'report': 24 * 7,  # Raw report HTML from dex.koi.security
+    'extracted': 24 * 7,  # Parsed extract_information output
+    'store_status': 24,  # Chrome Web Store listing status
+    'not_found': 24  # IDs dex.koi.security has no report for, re-checked sooner
+}
+# Expired records are still used (offline mode, version checks) until they
+# have been expired this long, then purge_expired deletes them
+REPORT_CACHE_PURGE_AFTER_HOURS = 24 * 30
 
 # User agents for rotation
 USER_AGENTS = [
@@ -27,6 +82,54 @@ USER_AGENTS = [
 # Request settings
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes read per chunk from streamed responses
+STREAM_DRAIN_BYTES = 256 * 1024  # Unread body read on close to keep the connection alive
+
+# Concurrency settings for batch lookups
+MAX_WORKERS = 8
+HOST_CONCURRENCY = {
+    'dex.koi.security': 4,
+    'chromewebstore.google.com': 4
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+# Rate limiting (requests per second per host) and retry backoff
+HOST_RATE_LIMITS = {
+    'dex.koi.security': 5.0,
+    'chromewebstore.google.com': 5.0
+}
+DEFAULT_HOST_RATE_LIMIT = 10.0
+MIN_HOST_RATE_LIMIT = 0.2  # Floor the adaptive rate is never lowered below
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_AFTER_MAX_SECONDS = 300.0
+
+# Circuit breaker: pause a host after this many consecutive failures
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 60.0
+
+# HTTP connection pool settings
+POOL_CONNECTIONS = 10  # Number of per-host pools kept alive
+POOL_MAXSIZE = 8  # Keep-alive connections per host
+
+# Lookup service (--serve) settings
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_MAX_BATCH = 1000  # Extension IDs accepted per lookup request
+SERVICE_FEED_CHECK_MINUTES = 15  # How often the service looks for due feeds
+SERVICE_PURGE_HOURS = 24  # How often the service purges expired report cache records
+
+# Upper bounds of the latency histogram buckets in --profile summaries
+PROFILE_HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Parser processes for batch runs (0 parses in the lookup threads, which is
+# faster on a single core where the processes would only add overhead)
+PARSER_PROCESSES = os.cpu_count() if (os.cpu_count() or 1) > 1 else 0
+PARSER_QUEUE_PER_PROCESS = 2  # Reports waiting or being parsed per process
+
+# HTML parser backend for BeautifulSoup ('html.parser' or 'lxml' if installed)
+PARSER_BACKEND = 'html.parser'
 
 # Extension ID validation
 EXTENSION_ID_PATTERN = r'^[a-z0-9]{32}$'
@@ -0,0 +1,386 @@
+"""
+Concurrent lookup engine for Chrome Extension Analyzer
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import MAX_WORKERS, CHROME_STORE_BASE_URL
+from parser import extract_information
+from profiling import profiler
+
+# scraper (and with it requests) is imported only when a lookup needs the
+# network, so offline runs start without loading the HTTP stack.
+
+STORE_ERROR_STATUS = (False, f"{CHROME_STORE_BASE_URL}error")
+
+class NotCachedError(Exception):
+    """
+    Raised in offline mode when a report is not in the cache.
+    """
+
+class ReportNotFoundError(Exception):
+    """
+    Raised when dex.koi.security has no report for an extension ID.
+    """
+
+class ReportFetchError(Exception):
+    """
+    Raised when a report could not be fetched (network or HTTP error).
+    """
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and share its result or exception. Nothing is kept
+    once the call completes, so a later call runs again (and is answered by
+    the report cache if there is one).
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Name of the coalesced calls, for the profiler counters
+        """
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        """
+        Call function(*args), or wait for the call already running for key.
+
+        Args:
+            key (hashable): Identifies calls that may share a result
+            function (callable): Function to call
+            *args: Arguments of the call
+
+        Returns:
+            The result of the call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            profiler.count(f"coalesced_{self.name}")
+            return future.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# Shared by every lookup of the process, so duplicate IDs within a batch
+# and concurrent service requests for the same ID are fetched once
+_report_flights = SingleFlight('report')
+_store_flights = SingleFlight('store_status')
+
+def _fetch_report(extension_id, archive=None):
+    """
+    Fetch a report, keeping a copy in the archive if one is given.
+
+    Returns:
+        tuple or None: (html_content, final_url), or None if there is no
+                       report for the ID, see fetch_extension_report
+
+    Raises:
+        ReportFetchError: If the report could not be fetched
+    """
+    import requests
+    from scraper import fetch_extension_report
+    try:
+        with profiler.timer('fetch_report', extension_id):
+            report = fetch_extension_report(extension_id)
+    except requests.RequestException as e:
+        raise ReportFetchError(str(e)) from e
+    if report is None:
+        return None
+
+    html_content, final_url = report
+    if archive is not None:
+        with profiler.timer('archive', extension_id):
+            archive.put('report', extension_id, final_url, html_content.encode('utf-8'))
+    return html_content, final_url
+
+def fetch_and_extract(extension_id, cache=None, offline=False, parse=extract_information, archive=None):
+    """
+    Fetch the extension report and extract its information.
+
+    With a cache, a fresh extraction is returned without any network work,
+    and a fresh raw report is re-parsed instead of being fetched again. An
+    expired extraction is reused if the report still redirects to the same
+    version, or if the re-fetched report is identical, so only new report
+    versions are parsed. IDs without a report are cached as not found,
+    with a shorter time-to-live, so they are not requested on every run.
+
+    Args:
+        extension_id (str): Chrome extension ID
+        cache (ReportCache): Report cache to read and update (optional)
+        offline (bool): Answer from the cache only, accepting stale records
+        parse (callable): Report parser, extract_information or ParserPool.parse
+        archive (HtmlArchive): Archive for every fetched report (optional)
+
+    Returns:
+        tuple: (extracted_data, final_url)
+
+    Raises:
+        ReportNotFoundError: If there is no report for the ID
+        ReportFetchError: If the report could not be fetched
+        NotCachedError: If offline and the report is not cached
+    """
+    if cache is None:
+        report = _fetch_report(extension_id, archive)
+        if report is None:
+            raise ReportNotFoundError(extension_id)
+        html_content, final_url = report
+        with profiler.timer('parse', extension_id):
+            return parse(html_content), final_url
+
+    cached = cache.get_extracted(extension_id, allow_stale=offline)
+    if cached is not None:
+        profiler.count('cache_hits_extracted')
+        return cached
+    profiler.count('cache_misses_extracted')
+
+    if cache.is_not_found(extension_id, allow_stale=offline):
+        profiler.count('cache_hits_not_found')
+        raise ReportNotFoundError(extension_id)
+    profiler.count('cache_misses_not_found')
+
+    report = cache.get_report(extension_id, allow_stale=offline)
+    if report is not None:
+        profiler.count('cache_hits_report')
+        html_content, final_url = report
+    elif offline:
+        profiler.count('cache_misses_report')
+        raise NotCachedError(extension_id)
+    else:
+        profiler.count('cache_misses_report')
+        from scraper import resolve_report_url
+
+        # An expired extraction is still valid while the report has not
+        # moved to a new version, which the redirect alone tells
+        previous = cache.get_extracted(extension_id, allow_stale=True)
+        if previous is not None:
+            with profiler.timer('resolve_version', extension_id):
+                latest_url = resolve_report_url(extension_id)
+            if latest_url is not None and latest_url == previous[1]:
+                profiler.count('versions_unchanged')
+                cache.touch(extension_id, 'extracted')
+                return previous
+
+        report = _fetch_report(extension_id, archive)
+        if report is None:
+            cache.put_not_found(extension_id)
+            raise ReportNotFoundError(extension_id)
+        html_content, final_url = report
+        cache.put_report(extension_id, html_content, final_url)
+
+        # put_report keeps the extraction only if the content is identical
+        previous = cache.get_extracted(extension_id, allow_stale=True)
+        if previous is not None:
+            profiler.count('reports_unchanged')
+            if previous[1] == final_url:
+                cache.touch(extension_id, 'extracted')
+            else:
+                # Same content under a new version URL: reuse the extraction
+                # and record it against the new URL
+                cache.put_extracted(extension_id, previous[0], final_url, html_content)
+            return previous[0], final_url
+
+    with profiler.timer('parse', extension_id):
+        extracted_data = parse(html_content)
+    cache.put_extracted(extension_id, extracted_data, final_url, html_content)
+    return extracted_data, final_url
+
+def check_store_status(extension_id, cache=None, offline=False):
+    """
+    Check Chrome Web Store status, using the cache when possible.
+
+    Network errors are reported as not listed, like check_chrome_store_status,
+    but are never cached.
+
+    Args:
+        extension_id (str): Chrome extension ID
+        cache (ReportCache): Report cache to read and update (optional)
+        offline (bool): Answer from the cache only, accepting stale records
+
+    Returns:
+        tuple: (is_listed, store_url), is_listed being None if offline
+               and the status is not cached
+    """
+    if cache is not None:
+        cached = cache.get_store_status(extension_id, allow_stale=offline)
+        if cached is not None:
+            profiler.count('cache_hits_store_status')
+            return cached
+        profiler.count('cache_misses_store_status')
+
+    if offline:
+        return None, f"{CHROME_STORE_BASE_URL}{extension_id}"
+
+    import requests
+    from scraper import fetch_chrome_store_status
+
+    try:
+        with profiler.timer('store_check', extension_id):
+            store_status = fetch_chrome_store_status(extension_id)
+    except requests.RequestException:
+        return STORE_ERROR_STATUS
+
+    if cache is not None:
+        cache.put_store_status(extension_id, store_status)
+    return store_status
+
+def _collect_result(extension_id, report_future, store_future):
+    """
+    Wait for both lookups of an extension and combine them into one result.
+
+    Args:
+        extension_id (str): Chrome extension ID
+        report_future (Future): Future of fetch_and_extract
+        store_future (Future): Future of check_store_status
+
+    Returns:
+        dict: Lookup result with 'extension_id', 'status' ('ok', 'not_found',
+              'not_cached' or 'error'), 'found', 'final_url', 'extracted_data',
+              'store_status' and 'error' (message of a failed fetch) keys
+    """
+    result = {
+        'extension_id': extension_id,
+        'status': 'ok',
+        'found': False,
+        'final_url': None,
+        'extracted_data': None,
+        'store_status': store_future.result(),
+        'error': None
+    }
+
+    try:
+        result['extracted_data'], result['final_url'] = report_future.result()
+        result['found'] = True
+    except ReportNotFoundError:
+        result['status'] = 'not_found'
+    except NotCachedError:
+        result['status'] = 'not_cached'
+    except ReportFetchError as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+
+    return result
+
+def lookup_extensions(extension_ids, max_workers=MAX_WORKERS, cache=None, offline=False, executor=None,
+                      parser_pool=None, archive=None):
+    """
+    Look up many extensions concurrently, yielding results in input order.
+
+    The report fetch and the Chrome Web Store check of every extension run
+    as separate tasks, so both hosts are queried at once. Per-host limits
+    are enforced by make_request. Lookups of an ID that is already being
+    looked up, by this call or any other, wait for and share that result.
+    At most max_workers extensions are in flight at a time, so the input
+    may be an arbitrarily long iterable.
+
+    Args:
+        extension_ids (iterable): Validated Chrome extension IDs
+        max_workers (int): Number of extensions looked up concurrently
+        cache (ReportCache): Report cache to read and update (optional)
+        offline (bool): Answer from the cache only, never touching the network
+        executor (ThreadPoolExecutor): Long-lived pool to run the lookups on,
+                                       instead of one created for this call
+        parser_pool (ParserPool): Parser processes to parse reports in,
+                                  instead of the lookup threads (optional)
+        archive (HtmlArchive): Archive for every fetched report (optional)
+
+    Yields:
+        dict: Lookup result for each extension, see _collect_result
+    """
+    max_workers = max(1, max_workers)
+    parse = parser_pool.parse if parser_pool is not None else extract_information
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max_workers * 2) as executor:
+            yield from _lookup_window(extension_ids, max_workers, cache, offline, executor, parse, archive)
+    else:
+        yield from _lookup_window(extension_ids, max_workers, cache, offline, executor, parse, archive)
+
+def _lookup_window(extension_ids, max_workers, cache, offline, executor, parse, archive):
+    """
+    Submit lookups with at most max_workers extensions in flight.
+
+    Yields:
+        dict: Lookup result for each extension, in input order
+    """
+    pending = deque()
+
+    for extension_id in extension_ids:
+        key = (extension_id, offline)
+        pending.append((
+            extension_id,
+            executor.submit(_report_flights.do, key, fetch_and_extract, extension_id, cache, offline, parse,
+                            archive),
+            executor.submit(_store_flights.do, key, check_store_status, extension_id, cache, offline)
+        ))
+        if len(pending) >= max_workers:
+            yield _collect_result(*pending.popleft())
+
+    while pending:
+        yield _collect_result(*pending.popleft())
+
+def reparse_archive(archive, extension_ids=None, cache=None, max_workers=MAX_WORKERS, parser_pool=None):
+    """
+    Extract information again from every archived report, offline.
+
+    Meant for re-running an improved extract_information over historic
+    reports: every archived version of a report is parsed, and the store
+    status comes from the cache only.
+
+    Args:
+        archive (HtmlArchive): Archive holding the reports
+        extension_ids (list): Only re-parse these extensions (optional)
+        cache (ReportCache): Report cache for the store status (optional)
+        max_workers (int): Number of reports parsed concurrently
+        parser_pool (ParserPool): Parser processes to parse reports in,
+                                  instead of threads of this process (optional)
+
+    Yields:
+        dict: Lookup result for each archived report version, like
+              lookup_extensions, by extension ID and capture time
+    """
+    max_workers = max(1, max_workers)
+    parse = parser_pool.parse if parser_pool is not None else extract_information
+
+    def reparse(capture):
+        html_content = archive.get(capture['content_hash'])
+        if html_content is None:
+            raise NotCachedError(capture['source'])
+        with profiler.timer('parse', capture['source']):
+            return parse(html_content.decode('utf-8')), capture['url']
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers * 2) as executor:
+        for capture in archive.captures('report', extension_ids):
+            extension_id = capture['source']
+            pending.append((
+                extension_id,
+                executor.submit(reparse, capture),
+                executor.submit(check_store_status, extension_id, cache, True)
+            ))
+            if len(pending) >= max_workers:
+                yield _collect_result(*pending.popleft())
+
+        while pending:
+            yield _collect_result(*pending.popleft())
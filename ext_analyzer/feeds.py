@@ -0,0 +1,219 @@
+"""
+Intelligence feed scheduling for Chrome Extension Analyzer
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+from config import (BLOG_URLS, FEEDS_FILE, CACHE_EXPIRY_HOURS,
+                    FEED_CONCURRENCY, FEED_DOMAIN_CONCURRENCY)
+from cache import is_feed_fresh
+from profiling import profiler
+from utils import sanitize_url
+
+def load_feeds(path=FEEDS_FILE):
+    """
+    Load the list of intelligence feeds.
+
+    The file holds {"feeds": [...]} where each entry is either a URL or an
+    object with 'url' and optional 'priority' (higher is fetched first) and
+    'refresh_hours'. Without the file, BLOG_URLS is used.
+
+    Args:
+        path (str): Feed list file
+
+    Returns:
+        list: Feed dictionaries with 'url', 'priority' and 'refresh_hours'
+
+    Raises:
+        ValueError: If the file is malformed or holds an invalid URL
+    """
+    if not os.path.exists(path):
+        entries = BLOG_URLS
+    else:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('feeds', [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            raise ValueError(f"Invalid feed file '{path}': {e}")
+
+    if not isinstance(entries, list):
+        raise ValueError(f"Invalid feed file '{path}': 'feeds' must be a list")
+
+    feeds = []
+    seen_urls = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'url': entry}
+        elif not isinstance(entry, dict):
+            raise ValueError(f"Invalid feed entry {entry!r} in '{path}': expected a URL or an object")
+        url = entry.get('url')
+        if not url or not isinstance(url, str):
+            raise ValueError(f"Feed entry without a URL in '{path}'")
+        try:
+            url = sanitize_url(url)
+        except ValueError as e:
+            raise ValueError(f"Invalid feed file '{path}': {e}")
+        for key in ('priority', 'refresh_hours'):
+            value = entry.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"Invalid {key} {value!r} for feed '{url}' in '{path}': expected a number")
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        feeds.append({
+            'url': url,
+            'priority': entry.get('priority', 0),
+            'refresh_hours': entry.get('refresh_hours', CACHE_EXPIRY_HOURS)
+        })
+
+    return feeds
+
+def due_feeds(feeds, feed_records):
+    """
+    Select the feeds whose refresh interval has elapsed.
+
+    Args:
+        feeds (list): Feed dictionaries from load_feeds
+        feed_records (dict): Cached feed records keyed by URL
+
+    Returns:
+        list: Due feeds, highest priority first
+    """
+    due = [feed for feed in feeds
+           if not is_feed_fresh(feed_records.get(feed['url']), feed['refresh_hours'])]
+    return sorted(due, key=lambda feed: -feed['priority'])
+
+class FeedFetchError(Exception):
+    """
+    A feed fetch failure, carrying the time spent before it failed.
+    """
+
+    def __init__(self, error, latency_ms):
+        super().__init__(str(error))
+        self.latency_ms = latency_ms
+
+def timed_fetch(feed_url, feed_record, archive=None):
+    """
+    Fetch a feed and measure how long it took.
+
+    Args:
+        feed_url (str): Blog URL
+        feed_record (dict): Cached feed record, or None
+        archive (HtmlArchive): Archive for changed blog HTML (optional)
+
+    Returns:
+        tuple: (feed_record, offsets, latency_ms), see fetch_blog_feed
+
+    Raises:
+        FeedFetchError: If the fetch failed, with its latency
+    """
+    # Imported here so offline runs never load the HTTP stack
+    from scraper import fetch_blog_feed
+
+    start = time.perf_counter()
+    try:
+        record, offsets = fetch_blog_feed(feed_url, feed_record, archive)
+    except Exception as e:
+        raise FeedFetchError(e, (time.perf_counter() - start) * 1000)
+    return record, offsets, (time.perf_counter() - start) * 1000
+
+def refresh_feeds(blog_cache, due, feed_records, max_workers=FEED_CONCURRENCY,
+                  domain_limit=FEED_DOMAIN_CONCURRENCY, archive=None):
+    """
+    Revalidate due feeds and update the blog cache.
+
+    Feeds are started in priority order, with at most max_workers in flight
+    overall and at most domain_limit per domain; a feed whose domain is
+    saturated is skipped over until a slot frees up, so other domains keep
+    making progress. Every fetch records its latency, bytes downloaded and
+    IDs found in the blog cache's feed statistics.
+
+    Args:
+        blog_cache (BlogCache): Blog cache to update
+        due (list): Due feeds from due_feeds, highest priority first
+        feed_records (dict): Cached feed records keyed by URL
+        max_workers (int): Maximum feeds fetched at once
+        domain_limit (int): Maximum feeds fetched at once per domain
+        archive (HtmlArchive): Archive for changed blog HTML (optional)
+    """
+    pending = list(due)
+    running = {}
+    domain_counts = Counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            # Start as many pending feeds as the global and per-domain limits allow
+            index = 0
+            while len(running) < max_workers and index < len(pending):
+                feed = pending[index]
+                domain = urlparse(feed['url']).hostname
+                if domain_counts[domain] >= domain_limit:
+                    index += 1
+                    continue
+                pending.pop(index)
+                domain_counts[domain] += 1
+                future = executor.submit(timed_fetch, feed['url'], feed_records.get(feed['url']), archive)
+                running[future] = (feed['url'], domain)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                feed_url, domain = running.pop(future)
+                domain_counts[domain] -= 1
+                _store_feed_result(blog_cache, feed_url, feed_records.get(feed_url), future)
+
+    _print_feed_summary(blog_cache.get_feed_stats([feed['url'] for feed in due]))
+
+def _print_feed_summary(stats):
+    """
+    Summarize a refresh from the feed statistics of the refreshed feeds.
+
+    Args:
+        stats (dict): Feed statistics from BlogCache.get_feed_stats
+    """
+    if not stats:
+        return
+    statuses = Counter(feed_stats['status'] for feed_stats in stats.values())
+    downloaded_kb = sum(feed_stats['bytes'] or 0 for feed_stats in stats.values()) / 1024
+    slowest_url, slowest = max(stats.items(), key=lambda item: item[1]['latency_ms'] or 0)
+    print(f"  Refreshed {len(stats)} feeds: {statuses['changed']} changed, {statuses['unchanged']} unchanged,"
+          f" {statuses['error']} failed, {downloaded_kb:.0f} KB downloaded,"
+          f" slowest {slowest_url} ({slowest['latency_ms'] or 0:.0f} ms)")
+    for feed_url, feed_stats in stats.items():
+        # A feed that has never been fetched successfully is likely misconfigured
+        if feed_stats['error_count'] > 1 and feed_stats['error_count'] == feed_stats['fetch_count']:
+            print(f"  Warning: {feed_url} failed on all {feed_stats['fetch_count']} fetches")
+
+def _store_feed_result(blog_cache, feed_url, previous_record, future):
+    """
+    Store a finished feed fetch in the blog cache and report it.
+
+    Args:
+        blog_cache (BlogCache): Blog cache to update
+        feed_url (str): Blog URL
+        previous_record (dict): Cached feed record before the fetch, or None
+        future (Future): Finished timed_fetch future
+    """
+    try:
+        record, offsets, latency_ms = future.result()
+    except FeedFetchError as e:
+        profiler.record('feed_fetch', e.latency_ms)
+        # Keep any previously cached IDs for this blog
+        blog_cache.record_feed_stats(feed_url, 'error', e.latency_ms, error=str(e))
+        print(f"  Error processing {feed_url}: {e}")
+        return
+
+    profiler.record('feed_fetch', latency_ms)
+    blog_cache.update_feed(feed_url, record, offsets)
+
+    if offsets is not None:
+        blog_cache.record_feed_stats(feed_url, 'changed', latency_ms, record['bytes'], len(offsets))
+        print(f"  Processed: {feed_url} ({len(offsets)} IDs found)")
+    else:
+        id_count = previous_record['id_count']
+        blog_cache.record_feed_stats(feed_url, 'unchanged', latency_ms, record['bytes'], id_count)
+        print(f"  Unchanged: {feed_url} ({id_count} IDs cached)")
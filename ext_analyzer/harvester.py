@@ -0,0 +1,249 @@
+"""
+Browser profile harvester for Chrome Extension Analyzer
+"""
+
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import HARVEST_BROWSER_PATHS, HARVEST_WORKERS, HARVEST_MAX_DEPTH, HARVEST_SKIP_LOCATIONS
+from utils import validate_extension_id
+
+PREFERENCES_FILES = ('Preferences', 'Secure Preferences')
+
+def parse_harvest_root(spec):
+    """
+    Parse a harvest root given as PATH or HOST=PATH.
+
+    Args:
+        spec (str): Root specification; HOST labels the machine the tree
+                    belongs to (e.g. a mounted disk image)
+
+    Returns:
+        tuple: (host, path), host defaulting to the local host name
+    """
+    host, separator, path = spec.partition('=')
+    if not separator or not host or os.path.exists(spec):
+        return socket.gethostname(), spec
+    return host, path
+
+def _browser_of(user_data_dir):
+    """
+    Name the browser of a user data directory from its location.
+
+    Returns:
+        str: Browser name from HARVEST_BROWSER_PATHS, or 'Chromium-based'
+    """
+    normalized = os.path.normpath(user_data_dir).replace(os.sep, '/')
+    for browser, relative_paths in HARVEST_BROWSER_PATHS.items():
+        if any(normalized.endswith('/' + relative_path) for relative_path in relative_paths):
+            return browser
+    return 'Chromium-based'
+
+def _latest_version(version_dirs):
+    """
+    Pick the newest version among an extension's version directories.
+
+    Chrome names them '<version>_<n>' (e.g. '1.10.0_0').
+
+    Returns:
+        str: Newest version without the suffix, or None
+    """
+    versions = [name.rpartition('_')[0] or name for name in version_dirs]
+    if not versions:
+        return None
+
+    def version_key(version):
+        return [int(part) if part.isdigit() else 0 for part in version.split('.')]
+    return max(versions, key=version_key)
+
+def _is_dir(path):
+    try:
+        return os.path.isdir(path)
+    except OSError:
+        return False
+
+def _subdirectories(path):
+    """
+    List the subdirectories of a directory, without following symlinks.
+
+    Returns:
+        list: (name, path) tuples, sorted by name
+    """
+    with os.scandir(path) as entries:
+        return sorted(
+            (entry.name, entry.path) for entry in entries
+            if entry.is_dir(follow_symlinks=False)
+        )
+
+def _read_extension_settings(profile_dir):
+    """
+    Read the installed extensions recorded in a profile's preference files.
+
+    Args:
+        profile_dir (str): Browser profile directory
+
+    Returns:
+        tuple: (profile_name, settings) where settings maps extension ID ->
+               settings dictionary, merged across Preferences and
+               Secure Preferences
+    """
+    profile_name = None
+    settings = {}
+    for filename in PREFERENCES_FILES:
+        try:
+            with open(os.path.join(profile_dir, filename), 'r', encoding='utf-8') as f:
+                preferences = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(preferences, dict):
+            continue
+
+        profile_name = profile_name or (preferences.get('profile') or {}).get('name')
+        extension_settings = (preferences.get('extensions') or {}).get('settings') or {}
+        if isinstance(extension_settings, dict):
+            for extension_id, setting in extension_settings.items():
+                if isinstance(setting, dict):
+                    settings.setdefault(extension_id, {}).update(setting)
+    return profile_name, settings
+
+def scan_profile(profile_dir, host, user, browser):
+    """
+    Collect the extensions installed in one browser profile.
+
+    Extensions are taken from the profile's Extensions directory (one
+    directory per ID, holding one directory per installed version) and
+    from the extension settings in its preference files. Component
+    extensions bundled with the browser are skipped.
+
+    Args:
+        profile_dir (str): Browser profile directory
+        host (str): Machine the profile belongs to
+        user (str): User whose home holds the profile, or None
+        browser (str): Browser name
+
+    Returns:
+        list: Installation dictionaries with 'extension_id', 'host', 'user',
+              'browser', 'profile', 'profile_name', 'version' and 'path'
+    """
+    profile_name, settings = _read_extension_settings(profile_dir)
+
+    versions = {}
+    extensions_dir = os.path.join(profile_dir, 'Extensions')
+    if _is_dir(extensions_dir):
+        for name, path in _subdirectories(extensions_dir):
+            try:
+                version_dirs = [version_name for version_name, _ in _subdirectories(path)]
+            except OSError:
+                version_dirs = []
+            versions[name] = _latest_version(version_dirs)
+
+    installations = []
+    for raw_id in sorted(set(versions) | set(settings)):
+        setting = settings.get(raw_id, {})
+        if setting.get('location') in HARVEST_SKIP_LOCATIONS:
+            continue
+        try:
+            extension_id = validate_extension_id(raw_id)
+        except ValueError:
+            continue  # e.g. the Temp directory of an update in progress
+
+        installations.append({
+            'extension_id': extension_id,
+            'host': host,
+            'user': user,
+            'browser': browser,
+            'profile': os.path.basename(profile_dir),
+            'profile_name': profile_name,
+            'version': versions.get(raw_id) or (setting.get('manifest') or {}).get('version'),
+            'path': profile_dir
+        })
+    return installations
+
+def scan_user_data(user_data_dir, host, user, browser):
+    """
+    Find the profiles of a browser user data directory.
+
+    Args:
+        user_data_dir (str): Browser user data directory
+        host (str): Machine the directory belongs to
+        user (str): User whose home holds the directory, or None
+        browser (str): Browser name
+
+    Returns:
+        list: scan_profile tasks, one per profile directory
+    """
+    return [
+        (scan_profile, path, host, user, browser)
+        for name, path in _subdirectories(user_data_dir)
+        if os.path.exists(os.path.join(path, 'Preferences')) or _is_dir(os.path.join(path, 'Extensions'))
+    ]
+
+def scan_home(home_dir, host, depth=HARVEST_MAX_DEPTH):
+    """
+    Find browser user data directories in a home directory.
+
+    A directory that holds no browser data is searched as a directory of
+    homes (e.g. /home, C:/Users or the root of a mounted disk image), at
+    most depth levels down. A browser user data or profile directory can
+    also be given directly.
+
+    Args:
+        home_dir (str): Home directory, or directory of homes
+        host (str): Machine the directory belongs to
+        depth (int): Levels left to search below home_dir
+
+    Returns:
+        list: scan_user_data, scan_profile or scan_home tasks
+    """
+    if os.path.exists(os.path.join(home_dir, 'Local State')):
+        return [(scan_user_data, home_dir, host, None, _browser_of(home_dir))]
+    if os.path.exists(os.path.join(home_dir, 'Preferences')):
+        return [(scan_profile, home_dir, host, None, _browser_of(os.path.dirname(home_dir)))]
+
+    user = os.path.basename(os.path.normpath(home_dir))
+    tasks = [
+        (scan_user_data, os.path.join(home_dir, relative_path), host, user, browser)
+        for browser, relative_paths in HARVEST_BROWSER_PATHS.items()
+        for relative_path in relative_paths
+        if _is_dir(os.path.join(home_dir, relative_path))
+    ]
+    if not tasks and depth > 0:
+        tasks = [(scan_home, path, host, depth - 1) for name, path in _subdirectories(home_dir)]
+    return tasks
+
+def harvest_extensions(roots, max_workers=HARVEST_WORKERS):
+    """
+    Harvest installed extensions from browser profiles under many roots.
+
+    Directory trees are walked concurrently: every home, user data
+    directory and profile is a separate task, so slow network shares and
+    disk images are scanned in parallel. Unreadable directories are
+    reported and skipped.
+
+    Args:
+        roots (list): (host, path) tuples from parse_harvest_root
+        max_workers (int): Directories scanned at once
+
+    Yields:
+        dict: Installation dictionaries from scan_profile, as profiles are scanned
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {executor.submit(scan_home, path, host): path for host, path in roots}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    results = future.result()
+                except OSError as e:
+                    print(f"Warning: Could not scan {path}: {e}")
+                    continue
+
+                for result in results:
+                    if isinstance(result, dict):
+                        yield result
+                    else:
+                        task, task_path, *task_args = result
+                        pending[executor.submit(task, task_path, *task_args)] = task_path
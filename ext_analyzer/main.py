@@ -4,105 +4,500 @@ Chrome Extension Analyzer - Main Entry Point
 """
 
 import argparse
+import contextlib
+import itertools
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from datetime import datetime
 
-from config import BLOG_URLS
-from utils import validate_extension_ids
-from cache import load_cache, save_cache, is_cache_fresh
-from scraper import parse_blog_for_extension_ids, fetch_extension_report, check_chrome_store_status
-from parser import extract_information
-from output import print_output, write_json_output, write_csv_output
+from config import MAX_WORKERS, FEEDS_FILE, SERVICE_HOST, SERVICE_PORT, PARSER_PROCESSES
+from utils import (validate_extension_ids, read_extension_id_lines, iter_unique_extension_ids,
+                   load_checkpoint, open_checkpoint)
+from cache import BlogCache
+from feeds import load_feeds, due_feeds, refresh_feeds
+from engine import lookup_extensions, reparse_archive
+from report_cache import ReportCache
+from output import print_output, format_json_output, open_output_sink
+from profiling import profiler
+
+def invalidate_cached(extension_ids, report_cache):
+    """
+    Drop cached records of each extension ID as it is consumed.
+
+    Args:
+        extension_ids (iterable): Extension IDs
+        report_cache (ReportCache): Report cache
+
+    Yields:
+        str: The same extension IDs
+    """
+    for extension_id in extension_ids:
+        report_cache.invalidate(extension_id)
+        yield extension_id
+
+def print_history(extension_ids, report_cache):
+    """
+    Print the analysed report versions of each extension.
+
+    Args:
+        extension_ids (list): Extension IDs
+        report_cache (ReportCache): Report cache holding the history
+    """
+    for extension_id in extension_ids:
+        history = report_cache.get_history(extension_id)
+        print(f"=== History: {extension_id} ===")
+        if not history:
+            print("No analysed reports recorded.\n")
+            continue
+
+        previous_verdict = None
+        for entry in history:
+            analyzed_at = datetime.fromtimestamp(entry['analyzed_at']).strftime('%Y-%m-%d %H:%M')
+            if previous_verdict is None:
+                note = ''
+            elif entry['verdict_hash'] != previous_verdict:
+                note = ' (verdict changed)'
+            else:
+                note = ' (verdict unchanged)'
+            malware_version = entry['extracted_data'].get('Malware version')
+            verdict = f"malware version {malware_version}" if malware_version else "no malware version"
+            print(f"{analyzed_at}  {entry['final_url']}  {verdict}{note}")
+            previous_verdict = entry['verdict_hash']
+        print()
+
+def harvest_installations(root_specs, installations, finished):
+    """
+    Harvest the extensions installed in browser profiles under some roots.
+
+    Each extension ID is yielded as soon as the first profile holding it has
+    been scanned, so lookups start while the remaining profiles are scanned.
+    An ID may turn up in more profiles after that, so its installations are
+    only complete once finished is set.
+
+    Args:
+        root_specs (list): Roots given as PATH or HOST=PATH
+        installations (dict): Filled with extension ID -> installation
+                              dictionaries, sorted once the scan is done
+        finished (threading.Event): Set when every profile has been scanned
+
+    Yields:
+        tuple: (number, extension_id) for each newly found extension ID,
+               like read_extension_id_lines
+    """
+    from harvester import parse_harvest_root, harvest_extensions
+
+    # Only the time spent waiting for the scan counts, not the lookups run
+    # while the generator is suspended
+    scan_ms = 0.0
+    start = time.perf_counter()
+    for installation in harvest_extensions([parse_harvest_root(spec) for spec in root_specs]):
+        entries = installations.setdefault(installation['extension_id'], [])
+        entries.append(installation)
+        if len(entries) == 1:
+            scan_ms += (time.perf_counter() - start) * 1000
+            yield len(installations), installation['extension_id']
+            start = time.perf_counter()
+    scan_ms += (time.perf_counter() - start) * 1000
+    profiler.record('harvest', scan_ms)
+
+    for entries in installations.values():
+        entries.sort(key=lambda entry: (entry['host'], entry['user'] or '', entry['browser'], entry['path']))
+    finished.set()
+
+    profile_count = len({(entry['host'], entry['path']) for entries in installations.values() for entry in entries})
+    print(f"Harvested {len(installations)} extensions from {profile_count} browser profiles.")
+    profiler.count('harvested_extensions', len(installations))
+
+def hold_results(results, finished):
+    """
+    Hold back results until an event is set, then pass them on in order.
+
+    Results are still consumed meanwhile, so the lookups keep going.
+
+    Args:
+        results (iterable): Lookup results
+        finished (threading.Event): Event to wait for
+
+    Yields:
+        dict: The same results
+    """
+    held = []
+    for result in results:
+        if not finished.is_set():
+            held.append(result)
+            continue
+        yield from held
+        held.clear()
+        yield result
+    yield from held
+
+def load_blog_index(feeds_file, offline=False, archive=None):
+    """
+    Load the blog index, revalidating due feeds unless offline.
+
+    Args:
+        feeds_file (str): Feed list file
+        offline (bool): Use the cached index however old
+        archive (HtmlArchive): Archive for changed blog HTML (optional)
+
+    Returns:
+        tuple: (feeds, blog_cache, extension_sources)
+    """
+    try:
+        feeds = load_feeds(feeds_file)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    feed_urls = [feed['url'] for feed in feeds]
+
+    blog_cache = BlogCache()
+    blog_cache.prune_feeds(feed_urls)
+    feed_records = blog_cache.get_feeds(feed_urls)
+    due = due_feeds(feeds, feed_records)
+
+    if due and not offline:
+        # One process refreshes at a time; a run that had to wait for another
+        # one re-reads the feeds, which that run may have refreshed already
+        with blog_cache.refresh_lock():
+            feed_records = blog_cache.get_feeds(feed_urls)
+            due = due_feeds(feeds, feed_records)
+            if due:
+                # Revalidate due blogs concurrently, rescanning only those that changed
+                print("Parsing blogs for extension IDs...")
+                with profiler.timer('feed_refresh'):
+                    refresh_feeds(blog_cache, due, feed_records, archive=archive)
+
+    extension_sources = blog_cache.extension_sources(feed_urls)
+    if not due or offline:
+        # Offline runs use whatever the cache holds, however old
+        print(f"Loaded {len(extension_sources)} extension IDs from cache.")
+        print()
+    else:
+        print(f"Found {len(extension_sources)} unique extension IDs across all blogs.\n")
+
+    return feeds, blog_cache, extension_sources
+
+def run_triage(inventory_path, blog_cache, hits_file):
+    """
+    Screen an inventory against the blog index and write the hits.
+
+    Each hit is written as the extension ID followed by the blogs it was
+    found in, so the hit list can be passed to --input for full analysis.
+
+    Args:
+        inventory_path (str): Inventory file, or '-' for standard input
+        blog_cache (BlogCache): Blog intelligence cache
+        hits_file (file): Open text file receiving the hits
+    """
+    from triage import load_known_id_filter, triage_inventory
+
+    start = time.perf_counter()
+    bloom_filter, rebuilt = load_known_id_filter(blog_cache)
+    if rebuilt:
+        print(f"Built Bloom filter of the index ({len(bloom_filter.bits)} bytes).")
+
+    stats = {}
+    try:
+        with profiler.timer('triage'):
+            for extension_id, blogs in triage_inventory(inventory_path, blog_cache, bloom_filter, stats):
+                hits_file.write(f"{extension_id}\t{' '.join(blogs)}\n")
+    except OSError as e:
+        print(f"Error: Could not read inventory '{inventory_path}': {e}")
+        sys.exit(1)
+    hits_file.flush()
+
+    for key, value in stats.items():
+        profiler.count(f"triage_{key}", value)
+    print(f"Screened {stats['lines']} lines ({stats['ids']} extension IDs) in "
+          f"{time.perf_counter() - start:.2f}s: {stats['hits']} hits, "
+          f"{stats['false_positives']} Bloom filter false positives.")
+
+def finish_run(args, trace_file):
+    """
+    Close the HTTP session and write the profile of the run.
+
+    Args:
+        args (Namespace): Parsed command line arguments
+        trace_file (file): Open trace file, or None
+    """
+    # Only close the HTTP session if a lookup actually loaded the scraper
+    scraper = sys.modules.get('scraper')
+    if scraper is not None:
+        scraper.close_session()
+
+    if args.profile:
+        profiler.write_summary(args.profile)
+        if args.profile != '-':
+            print(f"Profile saved to {args.profile}")
+    if trace_file is not None:
+        trace_file.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze Chrome Extension reports from dex.koi.security')
-    parser.add_argument('extension_ids', nargs='+', help='Chrome Extension ID(s) - accepts one or more IDs')
-    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text',
+    parser.add_argument('extension_ids', nargs='*', help='Chrome Extension ID(s) - accepts one or more IDs')
+    parser.add_argument('--input', help="File with one extension ID per line, or '-' to read from stdin")
+    parser.add_argument('--harvest', action='append', metavar='[HOST=]PATH',
+                       help='Look up the extensions installed in the Chrome, Chromium and Edge profiles under PATH '
+                            '(a home, a directory of homes or a mounted disk image); repeatable')
+    parser.add_argument('--checkpoint',
+                       help='File recording completed IDs; rerunning with the same file resumes an interrupted run')
+    parser.add_argument('--feeds', default=FEEDS_FILE,
+                       help=f'Feed list file (default: {FEEDS_FILE})')
+    parser.add_argument('--format', choices=['text', 'json', 'jsonl', 'csv'], default='text',
                        help='Output format (default: text)')
-    parser.add_argument('--output', help='Output file for JSON/CSV formats (optional)')
+    parser.add_argument('--output', help='Output file for JSON/JSON Lines/CSV formats (optional)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                       help=f'Number of extensions looked up concurrently (default: {MAX_WORKERS})')
+    parser.add_argument('--parsers', type=int, default=PARSER_PROCESSES,
+                       help=f'Processes parsing reports in batch runs, 0 to parse in the lookup threads '
+                            f'(default: {PARSER_PROCESSES})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Do not read or write the local report cache')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Ignore cached reports and store status for the given IDs and fetch them again')
+    parser.add_argument('--no-archive', action='store_true',
+                       help='Do not keep fetched report and blog HTML in the compressed archive')
+    parser.add_argument('--reparse', action='store_true',
+                       help='Extract information again from every archived report (of the given IDs), offline')
+    parser.add_argument('--offline', action='store_true',
+                       help='Answer from the local caches only, never touching the network')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                       help='Write a JSON summary of stage timings and counters at the end of the run '
+                            '(to FILE, or stderr if omitted)')
+    parser.add_argument('--trace', metavar='FILE',
+                       help='Write one JSON line per stage of every extension ID to FILE (implies profiling)')
+    parser.add_argument('--changed-only', action='store_true',
+                       help='Only output extensions whose verdict or findings changed since the last run')
+    parser.add_argument('--history', action='store_true',
+                       help='Print the analysed report versions of the given IDs and exit')
+    parser.add_argument('--triage', metavar='INVENTORY',
+                       help="Screen an inventory file ('-' for stdin) against the blog index and "
+                            "write only the hits, for full analysis with --input")
+    parser.add_argument('--serve', action='store_true',
+                       help='Run as a lookup service with warm caches instead of looking up IDs once')
+    parser.add_argument('--host', default=SERVICE_HOST,
+                       help=f'Address the lookup service listens on (default: {SERVICE_HOST})')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT,
+                       help=f'Port the lookup service listens on (default: {SERVICE_PORT})')
+    parser.add_argument('--socket', help='Unix socket the lookup service listens on instead of a TCP port')
 
     args = parser.parse_args()
 
-    # Validate extension IDs
+    if args.serve:
+        if (args.extension_ids or args.input or args.harvest or args.triage or args.reparse or args.checkpoint
+                or args.output or args.refresh):
+            parser.error('--serve cannot be combined with extension IDs, --input, --harvest, --triage, --reparse, '
+                         '--checkpoint, --output or --refresh')
+    elif args.triage:
+        if (args.extension_ids or args.input or args.harvest or args.reparse or args.checkpoint or args.history
+                or args.changed_only or args.refresh or args.format != 'text'):
+            parser.error('--triage cannot be combined with extension IDs, --input, --harvest, --reparse, '
+                         '--checkpoint, --history, --changed-only, --refresh or --format')
+    elif args.reparse:
+        if (args.input or args.harvest or args.checkpoint or args.history or args.changed_only or args.refresh
+                or args.no_archive):
+            parser.error('--reparse cannot be combined with --input, --harvest, --checkpoint, --history, '
+                         '--changed-only, --refresh or --no-archive')
+    elif not args.extension_ids and not args.input and not args.harvest:
+        parser.error('provide extension IDs, --input, --harvest, --triage or --reparse')
+    if args.offline and (args.no_cache or args.refresh):
+        parser.error('--offline cannot be combined with --no-cache or --refresh')
+    if args.no_cache and (args.changed_only or args.history):
+        parser.error('--changed-only and --history need the report cache')
+    if args.history and (args.input or args.harvest or not args.extension_ids):
+        parser.error('--history takes extension IDs on the command line')
+
+    trace_file = None
+    if args.profile or args.trace:
+        if args.trace:
+            trace_file = open(args.trace, 'w', encoding='utf-8', buffering=1)
+        profiler.enable(trace_file)
+
+    # Validate extension IDs given on the command line
     try:
         validated_ids = validate_extension_ids(args.extension_ids)
     except ValueError as e:
         print(f"Error: {e}")
         sys.exit(1)
 
-    # Try to load from cache first
-    extension_sources = {}
-    cache_loaded = False
-
-    if is_cache_fresh():
-        cache_data = load_cache()
-        if cache_data:
-            extension_sources = cache_data.get('extension_sources', {})
-            print(f"Loaded {len(extension_sources)} extension IDs from cache.")
-            cache_loaded = True
-
-    if not cache_loaded:
-        # Parse blogs concurrently to collect extension IDs and their source URLs
-        print("Parsing blogs for extension IDs...")
-        extension_sources = {}
-
-        with ThreadPoolExecutor(max_workers=len(BLOG_URLS)) as executor:
-            # Submit all blog parsing tasks
-            future_to_url = {executor.submit(parse_blog_for_extension_ids, url): url for url in BLOG_URLS}
-
-            # Process results as they complete
-            for future in as_completed(future_to_url):
-                blog_url = future_to_url[future]
-                try:
-                    found_ids = future.result()
-                    print(f"  Processed: {blog_url} ({len(found_ids)} IDs found)")
-                    for ext_id in found_ids:
-                        if ext_id not in extension_sources:
-                            extension_sources[ext_id] = []
-                        extension_sources[ext_id].append(blog_url)
-                except Exception as e:
-                    print(f"  Error processing {blog_url}: {e}")
-
-        # Save to cache
-        save_cache(extension_sources)
-        print(f"Found {len(extension_sources)} unique extension IDs across all blogs.\n")
-    else:
-        print()
+    if args.history:
+        report_cache = ReportCache()
+        print_history(validated_ids, report_cache)
+        report_cache.close()
+        return
+
+    # IDs from --input are read, validated and deduplicated lazily as the
+    # lookup engine consumes them, skipping IDs completed by a previous run
+    seen_ids = load_checkpoint(args.checkpoint)
+    if len(seen_ids):
+        print(f"Resuming: {len(seen_ids)} extension IDs already completed.")
+
+    id_lines = enumerate(validated_ids, 1)
+    if args.input:
+        id_lines = itertools.chain(id_lines, read_extension_id_lines(args.input))
 
-    # Process extensions
-    results = []
+    # Extensions installed in local or mounted browser profiles are looked
+    # up with the hosts and profiles they were found in
+    installations = None
+    harvest_finished = None
+    if args.harvest:
+        installations = {}
+        harvest_finished = threading.Event()
+        # Harvested IDs go first, so only their results wait for the scan
+        id_lines = itertools.chain(harvest_installations(args.harvest, installations, harvest_finished), id_lines)
+    extension_ids = iter_unique_extension_ids(id_lines, seen_ids)
 
-    for extension_id in validated_ids:
-        print(f"Fetching report for extension ID: {extension_id}")
+    # Fetched reports and blogs are archived compressed, so they can be
+    # re-parsed later without fetching them again; offline runs fetch
+    # nothing and only read cached reports back from it
+    archive = None
+    if args.reparse or not args.no_archive:
+        from archive import HtmlArchive
+        archive = HtmlArchive()
 
+    if args.triage:
+        # Only the hits go to stdout, so they can be piped into --input -
+        hits_file = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        with contextlib.redirect_stdout(sys.stdout if args.output else sys.stderr):
+            feeds, blog_cache, extension_sources = load_blog_index(args.feeds, args.offline, archive)
+            run_triage(args.triage, blog_cache, hits_file)
+        if args.output:
+            hits_file.close()
+            print(f"\nHits saved to {args.output}")
+        blog_cache.close()
+        if archive is not None:
+            archive.close()
+        finish_run(args, trace_file)
+        return
+
+    # Load per-feed blog data from cache and revalidate due feeds; re-parsing
+    # the archive never touches the network
+    feeds, blog_cache, extension_sources = load_blog_index(args.feeds, args.offline or args.reparse, archive)
+
+    # Process extensions, serving repeat lookups from the report cache
+    report_cache = None
+    if not args.no_cache:
+        report_cache = ReportCache(archive=archive)
+        if not args.offline:
+            # Offline runs keep every record, however old, to answer from
+            purged = report_cache.purge_expired()
+            if purged:
+                print(f"Purged {purged} long-expired records from the report cache.")
+        if args.refresh:
+            extension_ids = invalidate_cached(extension_ids, report_cache)
+
+    # Batches parse reports in separate processes, so parsing does not
+    # compete with the lookup threads for the GIL; a single ID is parsed in
+    # process rather than paying for starting them
+    parser_pool = None
+    if args.parsers > 0 and (args.serve or args.input or args.harvest or args.reparse or len(validated_ids) > 1):
+        from parse_pool import ParserPool
+        parser_pool = ParserPool(args.parsers)
+
+    if args.serve:
+        # Keep the caches, HTTP session and workers warm between requests
+        from service import LookupService, run_service
+        service = LookupService(blog_cache, feeds, report_cache, max_workers=args.workers, offline=args.offline,
+                                parser_pool=parser_pool, archive=archive)
+        if not run_service(service, args.host, args.port, args.socket):
+            sys.exit(1)
+        extension_ids = ()  # The service has stopped; only cleanup is left
+
+    checkpoint = open_checkpoint(args.checkpoint) if args.checkpoint else None
+
+    # Results are streamed to the output file as they complete; a resumed
+    # run appends to the output file of the interrupted one
+    sink = None
+    if args.output and args.format != 'text':
         try:
-            html_content, final_url = fetch_extension_report(extension_id)
-            print(f"Final URL: {final_url}")
+            sink = open_output_sink(args.format, args.output, append=len(seen_ids) > 0,
+                                    installations=installations is not None)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
 
-            extracted_data = extract_information(html_content)
+    if args.reparse:
+        results = reparse_archive(archive, validated_ids or None, report_cache, args.workers, parser_pool)
+    else:
+        results = lookup_extensions(extension_ids, max_workers=args.workers, cache=report_cache,
+                                    offline=args.offline, parser_pool=parser_pool, archive=archive)
+        if harvest_finished is not None:
+            # Results are written with every installation of their extension
+            results = hold_results(results, harvest_finished)
 
-            # Check Chrome Web Store status
-            store_status = check_chrome_store_status(extension_id)
+    # The sink and checkpoint are closed even if the run is interrupted, so
+    # the JSON array is terminated and a resumed run continues it
+    try:
+        for result in results:
+            extension_id = result['extension_id']
+            if args.reparse:
+                print(f"Re-parsing archived report for extension ID: {extension_id}")
+            else:
+                print(f"Fetching report for extension ID: {extension_id}")
 
-            # Output based on format
-            print_output(args.format, extension_id, extension_sources, store_status,
-                        extracted_data, final_url, results)
+            write_result = False
+            if result['found']:
+                print(f"Final URL: {result['final_url']}")
+
+                # Compare the verdict with the one reported by the last run;
+                # re-parsed historic reports are not the latest verdicts
+                change = None
+                if report_cache is not None and not args.reparse:
+                    change = report_cache.record_verdict(extension_id, result['extracted_data'], result['final_url'])
 
-        except SystemExit as e:
-            # Handle 404 or other fatal errors
-            if e.code == 1:
-                pass  # Error already printed by fetch_extension_report
+                if args.changed_only and change == 'unchanged':
+                    print("Verdict unchanged since the last run.")
+                else:
+                    if args.changed_only:
+                        print("New extension since the last run." if change == 'new'
+                              else "Verdict or findings changed since the last run.")
+                    write_result = True
+            elif result['status'] == 'not_found':
+                print(f"No report for {extension_id} on dex.koi.security.")
+                write_result = not args.changed_only  # There is no verdict to compare
+            elif result['status'] == 'not_cached':
+                if args.reparse:
+                    print(f"Archived report of {extension_id} is missing from the archive.")
+                else:
+                    print(f"Report for {extension_id} is not in the cache (offline mode).")
             else:
-                raise
-
-    # Write to file if specified and format requires it
-    if args.output:
-        if args.format == 'json':
-            write_json_output(results, args.output)
-            print(f"\nResults saved to {args.output}")
-        elif args.format == 'csv':
-            write_csv_output(results, args.output)
-            print(f"\nResults saved to {args.output}")
+                print(f"Error fetching report: {result['error']}")
+
+            # Output based on format
+            if write_result:
+                found_on = installations.get(extension_id, []) if installations is not None else None
+                with profiler.timer('output', extension_id):
+                    if sink is not None:
+                        sink.write(format_json_output(extension_id, extension_sources, result['store_status'],
+                                                      result['extracted_data'], result['final_url'], found_on))
+                    else:
+                        print_output(args.format, extension_id, extension_sources, result['store_status'],
+                                    result['extracted_data'], result['final_url'], installations=found_on)
+
+            # Failed and uncached lookups are left out of the checkpoint, so a
+            # resumed run retries them
+            profiler.count(f"results_{result['status']}")
+            if checkpoint is not None and result['status'] in ('ok', 'not_found'):
+                checkpoint.write(f"{extension_id}\n")
+    finally:
+        if sink is not None:
+            sink.close()
+        if checkpoint is not None:
+            checkpoint.close()
+
+    if sink is not None:
+        print(f"\nResults saved to {args.output}")
+
+    if parser_pool is not None:
+        parser_pool.close()
+    if report_cache is not None:
+        report_cache.close()
+    if archive is not None:
+        archive.close()
+    blog_cache.close()
+
+    finish_run(args, trace_file)
 
 if __name__ == "__main__":
     main()
@@ -4,12 +4,34 @@ Output formatting functions for Chrome Extension Analyzer
 
 import csv
 import json
+import os
 import sys
-from typing import Dict, List, Any
+from typing import Dict, List, Any, TextIO
+
+_JSON_ARRAY_BLOCK_SIZE = 64 * 1024  # Bytes read at a time when reopening a JSON array
+_JSON_RECORD_END = b"\n  }"  # Closing brace of a top-level record of a JSON array
+
+def format_installation(installation: Dict[str, Any]) -> str:
+    """
+    Describe where an extension is installed, in one line.
+
+    Args:
+        installation: Installation dictionary from the profile harvester
+
+    Returns:
+        str: e.g. "ws042/alice: Chrome Default (3.1.0)"
+    """
+    owner = installation['host']
+    if installation.get('user'):
+        owner += f"/{installation['user']}"
+    description = f"{owner}: {installation['browser']} {installation['profile']}"
+    if installation.get('version'):
+        description += f" ({installation['version']})"
+    return description
 
 def format_text_output(extension_id: str, extension_sources: Dict[str, List[str]],
                       store_status: tuple, extracted_data: Dict[str, Any],
-                      final_url: str) -> str:
+                      final_url: str, installations: List[Dict[str, Any]] = None) -> str:
     """
     Format output as human-readable text.
 
@@ -17,8 +39,9 @@ def format_text_output(extension_id: str, extension_sources: Dict[str, List[str]
         extension_id: Chrome extension ID
         extension_sources: Dictionary of extension sources
         store_status: Tuple of (is_listed, store_url)
-        extracted_data: Extracted extension data
+        extracted_data: Extracted extension data, or None if there is no report
         final_url: Final URL of the report
+        installations: Where the extension was found installed (optional)
 
     Returns:
         str: Formatted text output
@@ -39,13 +62,26 @@ def format_text_output(extension_id: str, extension_sources: Dict[str, List[str]
     else:
         output_lines.append("Source Blog: Extension not found in any analyzed blogs")
 
+    # Installations found by the profile harvester
+    if installations:
+        output_lines.append("Installed On:")
+        for installation in installations:
+            output_lines.append(f"  - {format_installation(installation)}")
+
     # Chrome Web Store status
     is_listed, store_url = store_status
     if is_listed:
         output_lines.append(f"Chrome Web Store: Listed ({store_url})")
+    elif is_listed is None:
+        output_lines.append(f"Chrome Web Store: Unknown, not cached ({store_url})")
     else:
         output_lines.append(f"Chrome Web Store: Not Listed ({store_url})")
 
+    if extracted_data is None:
+        output_lines.append("Report: Not found on dex.koi.security")
+        output_lines.append("")
+        return "\n".join(output_lines)
+
     output_lines.append(f"Final URL: {final_url}")
     output_lines.append("\n=== Extracted Information ===")
 
@@ -69,7 +105,7 @@ def format_text_output(extension_id: str, extension_sources: Dict[str, List[str]
 
 def format_json_output(extension_id: str, extension_sources: Dict[str, List[str]],
                       store_status: tuple, extracted_data: Dict[str, Any],
-                      final_url: str) -> Dict[str, Any]:
+                      final_url: str, installations: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Format output as JSON-compatible dictionary.
 
@@ -77,15 +113,18 @@ def format_json_output(extension_id: str, extension_sources: Dict[str, List[str]
         extension_id: Chrome extension ID
         extension_sources: Dictionary of extension sources
         store_status: Tuple of (is_listed, store_url)
-        extracted_data: Extracted extension data
+        extracted_data: Extracted extension data, or None if there is no report
         final_url: Final URL of the report
+        installations: Where the extension was found installed (optional)
 
     Returns:
-        dict: JSON-compatible output data
+        dict: JSON-compatible output data, with an "installations" list
+              when installations were given; "report_url" and
+              "extracted_data" are null if there is no report
     """
     is_listed, store_url = store_status
 
-    return {
+    data = {
         "extension_id": extension_id,
         "source_blogs": extension_sources.get(extension_id, []),
         "chrome_web_store": {
@@ -95,15 +134,24 @@ def format_json_output(extension_id: str, extension_sources: Dict[str, List[str]
         "report_url": final_url,
         "extracted_data": extracted_data
     }
+    if installations is not None:
+        data["installations"] = [
+            {key: value for key, value in installation.items() if key != 'extension_id'}
+            for installation in installations
+        ]
+    return data
 
-def format_csv_header() -> List[str]:
+def format_csv_header(installations: bool = False) -> List[str]:
     """
     Get CSV header row.
 
+    Args:
+        installations: Add the "installations" column of the profile harvester
+
     Returns:
         list: CSV header fields
     """
-    return [
+    header = [
         "extension_id",
         "source_blogs",
         "chrome_web_store_listed",
@@ -115,10 +163,13 @@ def format_csv_header() -> List[str]:
         "malware_version",
         "findings"
     ]
+    if installations:
+        header.append("installations")
+    return header
 
 def format_csv_row(extension_id: str, extension_sources: Dict[str, List[str]],
                   store_status: tuple, extracted_data: Dict[str, Any],
-                  final_url: str) -> List[str]:
+                  final_url: str, installations: List[Dict[str, Any]] = None) -> List[str]:
     """
     Format a single row for CSV output.
 
@@ -126,18 +177,21 @@ def format_csv_row(extension_id: str, extension_sources: Dict[str, List[str]],
         extension_id: Chrome extension ID
         extension_sources: Dictionary of extension sources
         store_status: Tuple of (is_listed, store_url)
-        extracted_data: Extracted extension data
+        extracted_data: Extracted extension data, or None if there is no report
         final_url: Final URL of the report
+        installations: Where the extension was found installed; the
+                       "installations" column is only added if given
 
     Returns:
         list: CSV row data
     """
     is_listed, store_url = store_status
+    extracted_data = extracted_data or {}
 
-    return [
+    row = [
         extension_id,
         "; ".join(extension_sources.get(extension_id, [])),
-        str(is_listed),
+        "" if is_listed is None else str(is_listed),
         store_url,
         final_url,
         extracted_data.get('Extension Name', ''),
@@ -146,6 +200,189 @@ def format_csv_row(extension_id: str, extension_sources: Dict[str, List[str]],
         extracted_data.get('Malware version', ''),
         "; ".join(extracted_data.get('Findings', [])) if isinstance(extracted_data.get('Findings'), list) else str(extracted_data.get('Findings', ''))
     ]
+    if installations is not None:
+        row.append("; ".join(format_installation(installation) for installation in installations))
+    return row
+
+def result_to_csv_row(result: Dict[str, Any]) -> List[str]:
+    """
+    Format a result dictionary from format_json_output as a CSV row.
+
+    Args:
+        result: Result dictionary
+
+    Returns:
+        list: CSV row data
+    """
+    return format_csv_row(
+        result["extension_id"],
+        {result["extension_id"]: result["source_blogs"]},
+        (result["chrome_web_store"]["listed"], result["chrome_web_store"]["url"]),
+        result["extracted_data"],
+        result["report_url"],
+        result.get("installations")
+    )
+
+class JsonLinesSink:
+    """
+    Output sink writing one compact JSON object per line.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, result: Dict[str, Any]):
+        self.stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+class JsonArraySink:
+    """
+    Output sink writing a JSON array incrementally.
+
+    The array is only terminated by close(), so prefer JSON Lines for runs
+    that may be killed; reopen_json_array continues an unterminated array.
+    """
+
+    def __init__(self, stream: TextIO, continued: bool = False):
+        """
+        Args:
+            stream: Output stream
+            continued: The stream already holds the opening bracket and at
+                       least one record (an array from reopen_json_array)
+        """
+        self.stream = stream
+        self.count = 0
+        self.continued = continued
+        if not continued:
+            self.stream.write("[")
+
+    def write(self, result: Dict[str, Any]):
+        separator = ",\n" if self.count or self.continued else "\n"
+        record = json.dumps(result, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        self.stream.write(f"{separator}  {record}")
+        self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        self.stream.write("\n]" if self.count or self.continued else "]")
+        self.stream.close()
+
+class CsvSink:
+    """
+    Output sink writing one CSV row per result.
+    """
+
+    def __init__(self, stream: TextIO, write_header: bool = True, installations: bool = False):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        if write_header:
+            self.writer.writerow(format_csv_header(installations))
+            self.stream.flush()
+
+    def write(self, result: Dict[str, Any]):
+        self.writer.writerow(result_to_csv_row(result))
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+def _find_last_record_end(f, size: int):
+    """
+    Find the end of the last complete record of a JSON array file.
+
+    Records are written indented by two spaces, so the closing brace of a
+    record is the only "}" at the start of a line indented by exactly two
+    spaces (strings cannot span lines). The file is searched backwards in
+    blocks, so only its tail is read.
+
+    Args:
+        f: File opened in binary mode
+        size: File size in bytes
+
+    Returns:
+        int or None: Byte offset just past the record, or None if the file
+                     holds no complete record
+    """
+    position = size
+    carry = b''
+    while position > 0:
+        start = max(0, position - _JSON_ARRAY_BLOCK_SIZE)
+        f.seek(start)
+        block = f.read(position - start) + carry
+        index = block.rfind(_JSON_RECORD_END)
+        if index >= 0:
+            return start + index + len(_JSON_RECORD_END)
+        carry = block[:len(_JSON_RECORD_END) - 1]
+        position = start
+    return None
+
+def reopen_json_array(filename: str):
+    """
+    Reopen a JSON array file written by JsonArraySink to add more records.
+
+    The file is cut back to the end of its last complete record, dropping
+    the closing bracket, or a record cut off when the run writing it was
+    killed. Only the head and tail of the file are read.
+
+    Args:
+        filename: JSON array file
+
+    Returns:
+        tuple: (stream, continued) with the file opened for appending and
+               whether it already holds records, for JsonArraySink
+
+    Raises:
+        ValueError: If the file does not hold a JSON array
+    """
+    with open(filename, 'r+b') as f:
+        if f.read(_JSON_ARRAY_BLOCK_SIZE).lstrip()[:1] != b'[':
+            raise ValueError(f"{filename} does not hold a JSON array, cannot append to it")
+        end = _find_last_record_end(f, os.fstat(f.fileno()).st_size)
+        f.truncate(end or 0)  # Without a complete record, start the array over
+    return open(filename, 'a', encoding='utf-8'), end is not None
+
+def open_output_sink(output_format: str, filename: str, append: bool = False, installations: bool = False):
+    """
+    Open a streaming output sink that flushes every result as it is written.
+
+    Args:
+        output_format: Output format ('json', 'jsonl' or 'csv')
+        filename: Output filename
+        append: Append to an existing file (e.g. when resuming); a JSON
+                array is reopened and continued
+        installations: Results carry the installations of the profile
+                       harvester (adds a CSV column)
+
+    Returns:
+        Sink with write(result) and close() methods, taking result
+        dictionaries from format_json_output
+
+    Raises:
+        ValueError: If the format is unsupported or the existing file cannot
+                    be appended to
+    """
+    exists = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+    if output_format == 'json':
+        if exists:
+            return JsonArraySink(*reopen_json_array(filename))
+        return JsonArraySink(open(filename, 'w', encoding='utf-8'))
+
+    mode = 'a' if append else 'w'
+    if output_format == 'jsonl':
+        return JsonLinesSink(open(filename, mode, encoding='utf-8'))
+    if output_format == 'csv':
+        if exists:
+            with open(filename, 'r', newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+            if header != format_csv_header(installations):
+                raise ValueError(f"{filename} has other CSV columns (written by another version, or with a "
+                                 f"different --harvest setting), cannot append to it")
+        return CsvSink(open(filename, mode, newline='', encoding='utf-8'), not exists, installations)
+
+    raise ValueError(f"Unsupported output format: '{output_format}'")
 
 def write_csv_output(results: List[Dict[str, Any]], filename: str = "extensions_report.csv"):
     """
@@ -158,19 +395,10 @@ def write_csv_output(results: List[Dict[str, Any]], filename: str = "extensions_
     if not results:
         return
 
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(format_csv_header())
-
-        for result in results:
-            row = format_csv_row(
-                result["extension_id"],
-                {result["extension_id"]: result["source_blogs"]},
-                (result["chrome_web_store"]["listed"], result["chrome_web_store"]["url"]),
-                result["extracted_data"],
-                result["report_url"]
-            )
-            writer.writerow(row)
+    sink = open_output_sink('csv', filename, installations=any("installations" in result for result in results))
+    for result in results:
+        sink.write(result)
+    sink.close()
 
 def write_json_output(results: List[Dict[str, Any]], filename: str = "extensions_report.json"):
     """
@@ -185,32 +413,42 @@ def write_json_output(results: List[Dict[str, Any]], filename: str = "extensions
 
 def print_output(output_format: str, extension_id: str, extension_sources: Dict[str, List[str]],
                 store_status: tuple, extracted_data: Dict[str, Any], final_url: str,
-                results_list: List[Dict[str, Any]] = None):
+                results_list: List[Dict[str, Any]] = None, installations: List[Dict[str, Any]] = None):
     """
     Print or save output based on format.
 
     Args:
-        output_format: Output format ('text', 'json', 'csv')
+        output_format: Output format ('text', 'json', 'jsonl', 'csv')
         extension_id: Chrome extension ID
         extension_sources: Dictionary of extension sources
         store_status: Tuple of (is_listed, store_url)
-        extracted_data: Extracted extension data
+        extracted_data: Extracted extension data, or None if there is no report
         final_url: Final URL of the report
         results_list: List to append JSON results to (for batch processing)
+        installations: Where the extension was found installed (optional)
     """
     if output_format == 'json':
-        json_data = format_json_output(extension_id, extension_sources, store_status, extracted_data, final_url)
+        json_data = format_json_output(extension_id, extension_sources, store_status, extracted_data, final_url,
+                                       installations)
         if results_list is not None:
             results_list.append(json_data)
             # Print individual JSON results for immediate feedback
             print(json.dumps(json_data, indent=2))
         else:
             print(json.dumps(json_data, indent=2))
+    elif output_format == 'jsonl':
+        json_data = format_json_output(extension_id, extension_sources, store_status, extracted_data, final_url,
+                                       installations)
+        if results_list is not None:
+            results_list.append(json_data)
+        print(json.dumps(json_data, ensure_ascii=False))
     elif output_format == 'csv':
         if results_list is not None:
-            json_data = format_json_output(extension_id, extension_sources, store_status, extracted_data, final_url)
+            json_data = format_json_output(extension_id, extension_sources, store_status, extracted_data, final_url,
+                                           installations)
             results_list.append(json_data)
             # For CSV, we don't print individual results since they're saved to file
     else:  # text format
-        text_output = format_text_output(extension_id, extension_sources, store_status, extracted_data, final_url)
+        text_output = format_text_output(extension_id, extension_sources, store_status, extracted_data, final_url,
+                                         installations)
         print(text_output)
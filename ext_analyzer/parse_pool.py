@@ -0,0 +1,81 @@
+"""
+Parser process pool for Chrome Extension Analyzer
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PARSER_QUEUE_PER_PROCESS
+from parser import extract_information
+
+def _warm_up():
+    """
+    Import BeautifulSoup in a new worker before its first report arrives.
+    """
+    extract_information('<html></html>')
+
+class ParserPool:
+    """
+    Process pool running extract_information outside the lookup threads.
+
+    Parsing is CPU-bound and holds the GIL, so parsing in the lookup threads
+    caps a run at one core however many reports are downloaded at once.
+    Reports are instead handed to parser processes through a bounded queue:
+    at most PARSER_QUEUE_PER_PROCESS reports per process are waiting or
+    being parsed, and a lookup thread with a report to parse blocks until
+    there is room. Parsing then scales with the cores while downloads stay
+    in the I/O-bound threads, and a slow parser stage holds back fetching
+    instead of piling up reports in memory.
+
+    The processes are started on the first report, so runs answered from
+    cached extractions never pay for them.
+    """
+
+    def __init__(self, processes, queue_size=None):
+        """
+        Args:
+            processes (int): Number of parser processes
+            queue_size (int): Reports waiting or being parsed at once,
+                              defaults to PARSER_QUEUE_PER_PROCESS per process
+        """
+        self.processes = max(1, processes)
+        self.queue_size = queue_size or self.processes * PARSER_QUEUE_PER_PROCESS
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that already runs lookup threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_up
+                )
+            return self._executor
+
+    def parse(self, html_content):
+        """
+        Extract information from a report in a parser process.
+
+        Blocks while the queue is full.
+
+        Args:
+            html_content (str): HTML content to parse
+
+        Returns:
+            dict: Output of extract_information
+        """
+        with self._slots:
+            return self._get_executor().submit(extract_information, html_content).result()
+
+    def close(self):
+        """
+        Stop the parser processes.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -3,43 +3,225 @@ HTML parsing functions for Chrome Extension Analyzer
 """
 
 import re
-from bs4 import BeautifulSoup
+from bisect import bisect_right
+from config import PARSER_BACKEND
 
-def extract_information(html_content):
+# Bump whenever extract_information changes its output, so cached
+# extraction results from older versions are re-parsed
+PARSER_VERSION = 1
+
+def make_soup(html_content, backend=None):
+    """
+    Parse HTML with the configured BeautifulSoup backend.
+
+    Args:
+        html_content (str): HTML content to parse
+        backend (str): BeautifulSoup tree builder, e.g. 'html.parser' or 'lxml'
+                       (defaults to PARSER_BACKEND)
+
+    Returns:
+        BeautifulSoup: Parsed document, using html.parser if the requested
+                       backend is not installed
+    """
+    # Imported here so loading this module (e.g. for PARSER_VERSION) stays cheap
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        return BeautifulSoup(html_content, backend or PARSER_BACKEND)
+    except FeatureNotFound:
+        return BeautifulSoup(html_content, 'html.parser')
+
+def is_not_found_page(html_content):
+    """
+    Check if a report page is the dex.koi.security 404 page.
+
+    A 404 page has an h1 whose only text is "404", which always appears
+    as ">404<" in the raw HTML. Pages without that marker are rejected by a
+    substring scan, so real reports are not parsed just for this check.
+
+    Args:
+        html_content (str): Report HTML
+
+    Returns:
+        bool: True if the page is the 404 page
+    """
+    if '>404<' not in html_content:
+        return False
+
+    soup = make_soup(html_content)
+    return soup.find('h1', class_='text-4xl font-bold mb-4', string='404') is not None
+
+class SectionIndex:
+    """
+    Index of a parsed report, built in a single walk over the document.
+
+    Elements are numbered in document order, which is the order
+    Tag.find_next() visits them. The descendants of the element at position
+    i occupy positions i+1 up to (not including) subtree_end[i], so
+    "inside" and "after" queries become range lookups instead of new walks.
+    """
+
+    def __init__(self, soup):
+        """
+        Walk the document once and index its elements.
+
+        Args:
+            soup (BeautifulSoup): Parsed document
+        """
+        from bs4 import Tag
+
+        self.elements = []
+        self.subtree_end = []
+        self.headings = []  # Positions of h2/h3 elements
+        self.h3_positions = []
+        self.p_positions = []
+        self.extension_name_h1 = None
+        self.first_h1 = None
+
+        open_elements = []  # Positions of the ancestors of the current element
+
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                continue
+
+            position = len(self.elements)
+            while open_elements and self.elements[open_elements[-1]] is not element.parent:
+                self.subtree_end[open_elements.pop()] = position
+            open_elements.append(position)
+
+            self.elements.append(element)
+            self.subtree_end.append(None)
+
+            name = element.name
+            if name in ('h2', 'h3'):
+                self.headings.append(position)
+                if name == 'h3':
+                    self.h3_positions.append(position)
+            elif name == 'p':
+                self.p_positions.append(position)
+            elif name == 'h1':
+                if self.first_h1 is None:
+                    self.first_h1 = element
+                if self.extension_name_h1 is None and _is_extension_name_h1(element):
+                    self.extension_name_h1 = element
+
+        for position in open_elements:
+            self.subtree_end[position] = len(self.elements)
+
+    def find_heading(self, keyword):
+        """
+        Find the first h2/h3 whose string contains a keyword.
+
+        Args:
+            keyword (str): Lowercase keyword to look for
+
+        Returns:
+            int or None: Position of the heading
+        """
+        for position in self.headings:
+            text = self.elements[position].string
+            if text and keyword in text.lower():
+                return position
+        return None
+
+    def section(self, heading):
+        """
+        Get the elements following a heading, up to the next h2/h3.
+
+        Args:
+            heading (int): Position of the heading
+
+        Returns:
+            list: Elements of the section, in document order
+        """
+        next_index = bisect_right(self.headings, heading)
+        end = self.headings[next_index] if next_index < len(self.headings) else len(self.elements)
+        return self.elements[heading + 1:end]
+
+    def h3_within(self, position):
+        """
+        Get the h3 elements nested inside an element.
+
+        Args:
+            position (int): Position of the element
+
+        Returns:
+            list: Positions of the h3 elements, in document order
+        """
+        start = bisect_right(self.h3_positions, position)
+        end = bisect_right(self.h3_positions, self.subtree_end[position] - 1)
+        return self.h3_positions[start:end]
+
+    def next_p(self, position):
+        """
+        Get the first p element after an element in document order.
+
+        Args:
+            position (int): Position of the element
+
+        Returns:
+            Tag or None: The paragraph, if any
+        """
+        index = bisect_right(self.p_positions, position)
+        if index < len(self.p_positions):
+            return self.elements[self.p_positions[index]]
+        return None
+
+def _is_extension_name_h1(h1):
+    """
+    Check if an h1 is the styled extension name header.
+
+    Args:
+        h1 (Tag): h1 element
+
+    Returns:
+        bool: True if its classes include text-2xl and font-medium
+    """
+    classes = h1.get('class')
+    if not classes:
+        return False
+    class_text = ' '.join(classes) if isinstance(classes, list) else classes
+    return 'text-2xl' in class_text and 'font-medium' in class_text
+
+def extract_information(html_content, backend=None):
     """
     Extract required information from the HTML content using generic HTML structure.
 
+    The document is walked once to build a SectionIndex, and every section
+    is extracted from that index.
+
     Args:
         html_content (str): HTML content to parse
+        backend (str): BeautifulSoup tree builder (defaults to PARSER_BACKEND)
 
     Returns:
         dict: Extracted data dictionary
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content, backend)
+    index = SectionIndex(soup)
 
     extracted_data = {}
 
     # Extract extension name from the main h1 header
-    extension_name_h1 = soup.find('h1', class_=lambda x: x and 'text-2xl' in x and 'font-medium' in x)
+    extension_name_h1 = index.extension_name_h1
     if extension_name_h1:
         extracted_data['Extension Name'] = extension_name_h1.get_text(strip=True)
     else:
         # Fallback: find any h1 that might contain the extension name
-        main_h1 = soup.find('h1')
+        main_h1 = index.first_h1
         if main_h1:
             extracted_data['Extension Name'] = main_h1.get_text(strip=True)
 
     # Find Analysis Summary section
-    analysis_header = soup.find(['h2', 'h3'], string=lambda text: text and 'analysis summary' in text.lower())
-    if analysis_header:
+    analysis_header = index.find_heading('analysis summary')
+    if analysis_header is not None:
         # Get all content until next h2/h3 header
         content_parts = []
-        current = analysis_header.find_next()
-        while current and current.name not in ['h2', 'h3']:
-            if current.name in ['p', 'div'] and current.get_text(strip=True):
+        for current in index.section(analysis_header):
+            if current.name in ['p', 'div']:
                 text = current.get_text(strip=True)
-                content_parts.append(text)
-            current = current.find_next()
+                if text:
+                    content_parts.append(text)
 
         if content_parts:
             full_content = ' '.join(content_parts)
@@ -68,12 +250,12 @@ def extract_information(html_content):
                 extracted_data['Analysis Summary'] = full_content
 
     # Find Malware Version section
-    malware_header = soup.find(['h2', 'h3'], string=lambda text: text and 'malware version' in text.lower())
-    if malware_header:
+    malware_header = index.find_heading('malware version')
+    if malware_header is not None and malware_header + 1 < len(index.elements):
         # Get the next content element
-        next_elem = malware_header.find_next()
-        if next_elem and next_elem.get_text(strip=True):
-            content = next_elem.get_text(strip=True)
+        next_elem = index.elements[malware_header + 1]
+        content = next_elem.get_text(strip=True)
+        if content:
             # Extract version number (e.g., "0.1.6.6" from "0.1.6.6Now Viewingmalware")
             version_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', content)
             if version_match:
@@ -83,36 +265,34 @@ def extract_information(html_content):
 
     # Extract Findings section
     findings = []
-    findings_header = soup.find(['h2', 'h3'], string=lambda text: text and 'findings' in text.lower())
-    if findings_header:
-        current = findings_header.find_next()
-        while current and current.name not in ['h2', 'h3']:
-            if current.name in ['p', 'div'] and current.get_text(strip=True):
-                text = current.get_text(strip=True)
-                if text and not 'enterprise' in text.lower() and not 'get started' in text.lower():
-                    # Parse individual findings - look for h3 headers within findings
-                    finding_headers = current.find_all('h3')
-                    if finding_headers:
-                        for header in finding_headers:
-                            finding_title = header.get_text(strip=True)
-                            if finding_title and len(finding_title) > 3:
-                                # Get the description paragraph that follows this h3
-                                next_elem = header.find_next('p')
-                                if next_elem:
-                                    description = next_elem.get_text(strip=True)
-                                    findings.append(f"{finding_title}: {description}")
-                                else:
-                                    findings.append(finding_title)
-                    else:
-                        # Fallback: parse from concatenated text
-                        # Split on capital letters followed by lowercase (finding titles)
-                        parts = re.split(r'([A-Z][a-zA-Z\s]+?)(?=[A-Z][a-zA-Z]|$)', text)
-                        for part in parts:
-                            part = part.strip()
-                            if part and len(part) > 3 and not part.startswith('Flags'):
-                                findings.append(part)
-
-            current = current.find_next()
+    findings_header = index.find_heading('findings')
+    if findings_header is not None:
+        for offset, current in enumerate(index.section(findings_header)):
+            if current.name not in ['p', 'div']:
+                continue
+            text = current.get_text(strip=True)
+            if text and not 'enterprise' in text.lower() and not 'get started' in text.lower():
+                # Parse individual findings - look for h3 headers within findings
+                finding_headers = index.h3_within(findings_header + 1 + offset)
+                if finding_headers:
+                    for header in finding_headers:
+                        finding_title = index.elements[header].get_text(strip=True)
+                        if finding_title and len(finding_title) > 3:
+                            # Get the description paragraph that follows this h3
+                            next_elem = index.next_p(header)
+                            if next_elem:
+                                description = next_elem.get_text(strip=True)
+                                findings.append(f"{finding_title}: {description}")
+                            else:
+                                findings.append(finding_title)
+                else:
+                    # Fallback: parse from concatenated text
+                    # Split on capital letters followed by lowercase (finding titles)
+                    parts = re.split(r'([A-Z][a-zA-Z\s]+?)(?=[A-Z][a-zA-Z]|$)', text)
+                    for part in parts:
+                        part = part.strip()
+                        if part and len(part) > 3 and not part.startswith('Flags'):
+                            findings.append(part)
 
     if findings:
         # Remove duplicates while preserving order
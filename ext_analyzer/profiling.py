@@ -0,0 +1,197 @@
+"""
+Run profiling for Chrome Extension Analyzer
+"""
+
+import json
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from config import PROFILE_HISTOGRAM_BUCKETS_MS
+
+class _NullTimer:
+    """
+    Timer used while profiling is disabled; does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    """
+    Context manager recording the time spent in a block as one stage sample.
+    """
+
+    def __init__(self, profiler, stage, extension_id):
+        self.profiler = profiler
+        self.stage = stage
+        self.extension_id = extension_id
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.stage, (time.perf_counter() - self.start) * 1000, self.extension_id)
+        return False
+
+class Profiler:
+    """
+    Per-stage timers and counters for a run.
+
+    Disabled by default, in which case timing and counting cost next to
+    nothing. Once enabled, every stage sample is kept (as a compact array
+    of milliseconds) for the end-of-run summary, and samples tied to an
+    extension ID can also be written as JSON trace lines as they happen.
+    Safe to use from many threads.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started_at = time.perf_counter()
+        self.counters = Counter()
+        self.samples = {}
+        self.trace_file = None
+        self._lock = threading.Lock()
+
+    def enable(self, trace_file=None):
+        """
+        Start collecting timings and counters.
+
+        Args:
+            trace_file (file): Open text file receiving one JSON line per
+                               stage sample of an extension ID (optional)
+        """
+        self.enabled = True
+        self.started_at = time.perf_counter()
+        self.trace_file = trace_file
+
+    def count(self, name, amount=1):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): Counter name
+            amount (int): Amount to add
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += amount
+
+    def timer(self, stage, extension_id=None):
+        """
+        Time a block of code as one sample of a stage.
+
+        Args:
+            stage (str): Stage name
+            extension_id (str): Extension ID the work belongs to, for tracing
+
+        Returns:
+            context manager: Records the sample when the block exits
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage, extension_id)
+
+    def record(self, stage, elapsed_ms, extension_id=None):
+        """
+        Record one sample of a stage.
+
+        Args:
+            stage (str): Stage name
+            elapsed_ms (float): Time spent
+            extension_id (str): Extension ID the work belongs to, for tracing
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = array('d')
+            samples.append(elapsed_ms)
+
+            if self.trace_file is not None and extension_id is not None:
+                self.trace_file.write(json.dumps({
+                    'extension_id': extension_id,
+                    'stage': stage,
+                    'ms': round(elapsed_ms, 3),
+                    'at_s': round(time.perf_counter() - self.started_at, 3)
+                }) + '\n')
+
+    def summary(self):
+        """
+        Summarize the run.
+
+        Returns:
+            dict: 'wall_seconds', 'counters' and per-stage 'stages' statistics
+                  (count, total, mean, p50/p90/p99, max and a histogram over
+                  PROFILE_HISTOGRAM_BUCKETS_MS)
+        """
+        with self._lock:
+            counters = dict(sorted(self.counters.items()))
+            samples = {stage: sorted(values) for stage, values in self.samples.items()}
+
+        return {
+            'wall_seconds': round(time.perf_counter() - self.started_at, 3),
+            'counters': counters,
+            'stages': {stage: _stage_summary(values) for stage, values in sorted(samples.items())}
+        }
+
+    def write_summary(self, path):
+        """
+        Write the run summary as JSON.
+
+        Args:
+            path (str): Output file, or '-' for stderr
+        """
+        text = json.dumps(self.summary(), indent=2)
+        if path == '-':
+            print(text, file=sys.stderr)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+
+def _stage_summary(values):
+    """
+    Summarize the sorted samples of one stage.
+
+    Args:
+        values (list): Samples in milliseconds, ascending
+
+    Returns:
+        dict: Stage statistics
+    """
+    def percentile(percent):
+        return round(values[min(len(values) - 1, int(percent / 100 * len(values)))], 3)
+
+    histogram = Counter()
+    for value in values:
+        index = bisect_left(PROFILE_HISTOGRAM_BUCKETS_MS, value)
+        if index < len(PROFILE_HISTOGRAM_BUCKETS_MS):
+            histogram[f"<={PROFILE_HISTOGRAM_BUCKETS_MS[index]}ms"] += 1
+        else:
+            histogram[f">{PROFILE_HISTOGRAM_BUCKETS_MS[-1]}ms"] += 1
+
+    total = sum(values)
+    labels = [f"<={bound}ms" for bound in PROFILE_HISTOGRAM_BUCKETS_MS] + [f">{PROFILE_HISTOGRAM_BUCKETS_MS[-1]}ms"]
+    return {
+        'count': len(values),
+        'total_ms': round(total, 3),
+        'mean_ms': round(total / len(values), 3),
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': round(values[-1], 3),
+        'histogram': {label: histogram[label] for label in labels if histogram[label]}
+    }
+
+# Shared by every module of a run
+profiler = Profiler()
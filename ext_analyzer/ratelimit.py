@@ -0,0 +1,150 @@
+"""
+Per-host rate limiting for Chrome Extension Analyzer
+"""
+
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from config import (HOST_RATE_LIMITS, DEFAULT_HOST_RATE_LIMIT, MIN_HOST_RATE_LIMIT,
+                    BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS, RETRY_AFTER_MAX_SECONDS,
+                    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value (str): Header value, either delay seconds or an HTTP date
+
+    Returns:
+        float or None: Delay in seconds (capped at RETRY_AFTER_MAX_SECONDS),
+                       or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        delay = float(value)
+    else:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at is None:
+            return None
+        delay = retry_at.timestamp() - time.time()
+
+    return min(max(delay, 0.0), RETRY_AFTER_MAX_SECONDS)
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Compute the delay before retrying a request.
+
+    Args:
+        attempt (int): Zero-based number of the attempt that failed
+        retry_after (float): Delay requested by the server, if any
+
+    Returns:
+        float: Seconds to wait; the server's Retry-After when given,
+               otherwise exponential backoff with full jitter
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+class HostLimiter:
+    """
+    Adaptive token bucket and circuit breaker for a single host.
+
+    The bucket refills at the host's current rate. Throttling responses
+    halve the rate (down to MIN_HOST_RATE_LIMIT) and successes raise it
+    back gradually towards the configured rate. After
+    BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens and
+    every request to the host waits out the cool-down, while requests to
+    other hosts carry on.
+    """
+
+    def __init__(self, host, rate):
+        """
+        Args:
+            host (str): Host name
+            rate (float): Maximum requests per second
+        """
+        self.host = host
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated_at = time.monotonic()
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until the breaker is closed and a token is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            # Reserve a token now and sleep off any deficit outside the lock
+            self.tokens -= 1
+            wait = max(self.open_until - now, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self):
+        """
+        Record a successful request, closing the breaker and recovering the rate.
+        """
+        with self._lock:
+            self.failures = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def record_failure(self, retry_after=None, throttled=False):
+        """
+        Record a failed request.
+
+        Args:
+            retry_after (float): Delay requested by the server, if any
+            throttled (bool): True if the server asked us to slow down
+        """
+        with self._lock:
+            self.failures += 1
+            if throttled:
+                self.rate = max(MIN_HOST_RATE_LIMIT, self.rate / 2)
+
+            now = time.monotonic()
+            if retry_after:
+                self.open_until = max(self.open_until, now + retry_after)
+            if self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.open_until = max(self.open_until, now + BREAKER_COOLDOWN_SECONDS)
+                print(f"Pausing requests to {self.host} for {self.open_until - now:.0f}s "
+                      f"after {self.failures} consecutive failures")
+                self.failures = 0
+
+def get_host_limiter(url):
+    """
+    Get the limiter of the URL's host, creating it on first use.
+
+    Args:
+        url (str): URL that is about to be requested
+
+    Returns:
+        HostLimiter: Limiter shared by all requests to the host
+    """
+    host = urlparse(url).hostname or ''
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(host, HOST_RATE_LIMITS.get(host, DEFAULT_HOST_RATE_LIMIT))
+            _limiters[host] = limiter
+        return limiter
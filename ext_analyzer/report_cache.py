@@ -0,0 +1,410 @@
+"""
+Persistent report cache for Chrome Extension Analyzer
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from config import REPORT_CACHE_FILE, REPORT_CACHE_TTL_HOURS, REPORT_CACHE_PURGE_AFTER_HOURS
+from parser import PARSER_VERSION
+
+RECORD_TYPES = ('report', 'extracted', 'store_status', 'not_found')
+
+# Extracted fields that make up an extension's verdict for change detection
+VERDICT_FIELDS = ('Malware version', 'Findings', 'Key Insights')
+
+HISTORY_FIELDS = ('final_url', 'report_hash', 'verdict_hash', 'analyzed_at', 'extracted_data')
+
+def content_hash(text):
+    """
+    Compute a stable hash of report content.
+
+    Args:
+        text (str): Content to hash
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def verdict_hash(extracted_data):
+    """
+    Compute a stable hash of the verdict fields of an extraction.
+
+    Args:
+        extracted_data (dict): Output of extract_information
+
+    Returns:
+        str: Hex SHA-256 digest of the VERDICT_FIELDS values
+    """
+    verdict = {field: extracted_data.get(field) for field in VERDICT_FIELDS}
+    return content_hash(json.dumps(verdict, sort_keys=True))
+
+class ReportCache:
+    """
+    SQLite-backed cache of per-extension lookup records.
+
+    Each extension ID has up to one record per type in RECORD_TYPES, each
+    with its own time-to-live. Storing a raw report whose content differs
+    from the cached one invalidates the extraction derived from it, and
+    extractions made by an older PARSER_VERSION are treated as missing.
+    IDs without a report are remembered too (negative caching), with a
+    shorter time-to-live so reports published later are picked up.
+    Every analysed report version is also kept in a history table, and the
+    verdict last reported for each extension in a verdicts table.
+    With an archive, raw reports are kept only there and the cache records
+    their content hash, so each report is stored once.
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, path=REPORT_CACHE_FILE, ttl_hours=None, archive=None):
+        """
+        Open (and create if needed) the cache database.
+
+        Args:
+            path (str): SQLite database file
+            ttl_hours (dict): Time-to-live in hours per record type,
+                              defaults to REPORT_CACHE_TTL_HOURS
+            archive (HtmlArchive): Archive holding the raw reports (optional)
+        """
+        self.path = path
+        self.archive = archive
+        self.ttl_hours = dict(REPORT_CACHE_TTL_HOURS)
+        if ttl_hours:
+            self.ttl_hours.update(ttl_hours)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                ' extension_id TEXT NOT NULL,'
+                ' record_type TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' stored_at REAL NOT NULL,'
+                ' PRIMARY KEY (extension_id, record_type))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                ' extension_id TEXT NOT NULL,'
+                ' final_url TEXT NOT NULL,'
+                ' report_hash TEXT NOT NULL,'
+                ' verdict_hash TEXT NOT NULL,'
+                ' analyzed_at REAL NOT NULL,'
+                ' extracted_data TEXT NOT NULL,'
+                ' PRIMARY KEY (extension_id, final_url, report_hash))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS verdicts ('
+                ' extension_id TEXT PRIMARY KEY,'
+                ' verdict_hash TEXT NOT NULL,'
+                ' final_url TEXT,'
+                ' seen_at REAL NOT NULL)'
+            )
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def get(self, extension_id, record_type, allow_stale=False):
+        """
+        Get a fresh record.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            record_type (str): One of RECORD_TYPES
+            allow_stale (bool): Also return records past their time-to-live
+
+        Returns:
+            dict or None: Record payload if present and fresh, None otherwise
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, stored_at FROM records WHERE extension_id = ? AND record_type = ?',
+                (extension_id, record_type)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        payload, stored_at = row
+        if not allow_stale and time.time() - stored_at > self.ttl_hours[record_type] * 3600:
+            return None
+
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, extension_id, record_type, payload):
+        """
+        Store a record, replacing any previous one of the same type.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            record_type (str): One of RECORD_TYPES
+            payload (dict): JSON-serializable record payload
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO records (extension_id, record_type, payload, stored_at) '
+                'VALUES (?, ?, ?, ?)',
+                (extension_id, record_type, json.dumps(payload, separators=(',', ':')), time.time())
+            )
+
+    def touch(self, extension_id, record_type):
+        """
+        Mark a record as fresh again without changing it.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            record_type (str): One of RECORD_TYPES
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE records SET stored_at = ? WHERE extension_id = ? AND record_type = ?',
+                (time.time(), extension_id, record_type)
+            )
+
+    def invalidate(self, extension_id, record_type=None):
+        """
+        Remove cached records of an extension.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            record_type (str): Record type to remove, or None for all types
+        """
+        with self._lock, self._conn:
+            if record_type is None:
+                self._conn.execute('DELETE FROM records WHERE extension_id = ?', (extension_id,))
+            else:
+                self._conn.execute(
+                    'DELETE FROM records WHERE extension_id = ? AND record_type = ?',
+                    (extension_id, record_type)
+                )
+
+    def purge_expired(self, grace_hours=REPORT_CACHE_PURGE_AFTER_HOURS):
+        """
+        Delete records that expired long ago.
+
+        Expired records are kept for grace_hours past their type's
+        time-to-live, since offline lookups and version checks still use
+        them. The history and verdicts are never purged.
+
+        Args:
+            grace_hours (float): Hours a record is kept after it expired
+
+        Returns:
+            int: Number of records deleted
+        """
+        now = time.time()
+        deleted = 0
+        with self._lock, self._conn:
+            for record_type in RECORD_TYPES:
+                deleted += self._conn.execute(
+                    'DELETE FROM records WHERE record_type = ? AND stored_at < ?',
+                    (record_type, now - (self.ttl_hours[record_type] + grace_hours) * 3600)
+                ).rowcount
+        return deleted
+
+    def get_report(self, extension_id, allow_stale=False):
+        """
+        Get the cached raw report.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            allow_stale (bool): Also return records past their time-to-live
+
+        Returns:
+            tuple or None: (html_content, final_url) if cached and fresh,
+                           and still in the archive if it is kept there
+        """
+        record = self.get(extension_id, 'report', allow_stale)
+        if record is None:
+            return None
+        if 'html' in record:
+            return record['html'], record['final_url']
+
+        # Only the hash is cached, the report itself is in the archive
+        data = self.archive.get(record['report_hash']) if self.archive is not None else None
+        if data is None:
+            return None
+        return data.decode('utf-8'), record['final_url']
+
+    def put_report(self, extension_id, html_content, final_url):
+        """
+        Store a raw report, invalidating the extraction if the content changed.
+
+        A report already in the archive is recorded by its hash only.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            html_content (str): Report HTML
+            final_url (str): Final URL of the report
+        """
+        digest = content_hash(html_content)
+        extracted = self.get(extension_id, 'extracted', allow_stale=True)
+        if extracted is not None and extracted.get('report_hash') != digest:
+            self.invalidate(extension_id, 'extracted')
+        self.invalidate(extension_id, 'not_found')
+
+        record = {'final_url': final_url, 'report_hash': digest}
+        if self.archive is None or not self.archive.contains(digest):
+            record['html'] = html_content
+        self.put(extension_id, 'report', record)
+
+    def is_not_found(self, extension_id, allow_stale=False):
+        """
+        Check if the extension's report was recently found to be missing.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            allow_stale (bool): Also accept records past their time-to-live
+
+        Returns:
+            bool: True if a fresh not-found record is cached
+        """
+        return self.get(extension_id, 'not_found', allow_stale) is not None
+
+    def put_not_found(self, extension_id):
+        """
+        Remember that dex.koi.security has no report for an extension.
+
+        A report or extraction cached before the report disappeared is
+        dropped, so the ID is answered as not found; the history keeps it.
+
+        Args:
+            extension_id (str): Chrome extension ID
+        """
+        self.invalidate(extension_id, 'report')
+        self.invalidate(extension_id, 'extracted')
+        self.put(extension_id, 'not_found', {})
+
+    def get_extracted(self, extension_id, allow_stale=False):
+        """
+        Get the cached extraction result.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            allow_stale (bool): Also return records past their time-to-live
+
+        Returns:
+            tuple or None: (extracted_data, final_url) if cached, fresh and
+                           produced by the current PARSER_VERSION
+        """
+        record = self.get(extension_id, 'extracted', allow_stale)
+        if record is None or record.get('parser_version') != PARSER_VERSION:
+            return None
+        return record['extracted_data'], record['final_url']
+
+    def put_extracted(self, extension_id, extracted_data, final_url, html_content):
+        """
+        Store an extraction result.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            extracted_data (dict): Output of extract_information
+            final_url (str): Final URL of the report
+            html_content (str): Report HTML the data was extracted from
+        """
+        digest = content_hash(html_content)
+        self.put(extension_id, 'extracted', {
+            'extracted_data': extracted_data,
+            'final_url': final_url,
+            'report_hash': digest,
+            'parser_version': PARSER_VERSION
+        })
+
+        # The first analysis of each report version is kept in the history
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO history (extension_id, final_url, report_hash, verdict_hash,'
+                ' analyzed_at, extracted_data) VALUES (?, ?, ?, ?, ?, ?)',
+                (extension_id, final_url, digest, verdict_hash(extracted_data), time.time(),
+                 json.dumps(extracted_data, separators=(',', ':')))
+            )
+
+    def get_history(self, extension_id):
+        """
+        Get every analysed version of an extension's report.
+
+        Args:
+            extension_id (str): Chrome extension ID
+
+        Returns:
+            list: History entries with the HISTORY_FIELDS keys, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(HISTORY_FIELDS)} FROM history WHERE extension_id = ? ORDER BY analyzed_at',
+                (extension_id,)
+            ).fetchall()
+
+        history = []
+        for row in rows:
+            entry = dict(zip(HISTORY_FIELDS, row))
+            entry['extracted_data'] = json.loads(entry['extracted_data'])
+            history.append(entry)
+        return history
+
+    def record_verdict(self, extension_id, extracted_data, final_url):
+        """
+        Remember the verdict reported for an extension and compare it with the last one.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            extracted_data (dict): Output of extract_information
+            final_url (str): Final URL of the report
+
+        Returns:
+            str: 'new' if no verdict was recorded before, 'changed' if the
+                 verdict fields differ from the last recorded ones,
+                 'unchanged' otherwise
+        """
+        digest = verdict_hash(extracted_data)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT verdict_hash FROM verdicts WHERE extension_id = ?', (extension_id,)
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO verdicts (extension_id, verdict_hash, final_url, seen_at) '
+                'VALUES (?, ?, ?, ?)',
+                (extension_id, digest, final_url, time.time())
+            )
+
+        if row is None:
+            return 'new'
+        return 'unchanged' if row[0] == digest else 'changed'
+
+    def get_store_status(self, extension_id, allow_stale=False):
+        """
+        Get the cached Chrome Web Store status.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            allow_stale (bool): Also return records past their time-to-live
+
+        Returns:
+            tuple or None: (is_listed, store_url) if cached and fresh
+        """
+        record = self.get(extension_id, 'store_status', allow_stale)
+        if record is None:
+            return None
+        return record['listed'], record['url']
+
+    def put_store_status(self, extension_id, store_status):
+        """
+        Store a Chrome Web Store status.
+
+        Args:
+            extension_id (str): Chrome extension ID
+            store_status (tuple): (is_listed, store_url)
+        """
+        is_listed, store_url = store_status
+        self.put(extension_id, 'store_status', {'listed': is_listed, 'url': store_url})
@@ -2,11 +2,50 @@
 Web scraping functions for Chrome Extension Analyzer
 """
 
+import codecs
+import hashlib
 import random
 import re
+import threading
+import time
+from urllib.parse import urljoin, urlparse
 import requests
-from bs4 import BeautifulSoup
-from config import USER_AGENTS, REQUEST_TIMEOUT, MAX_RETRIES
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from parser import is_not_found_page
+from ratelimit import get_host_limiter, parse_retry_after, backoff_delay
+from profiling import profiler
+from config import (USER_AGENTS, REQUEST_TIMEOUT, MAX_RETRIES, RETRY_STATUS_CODES,
+                    HOST_CONCURRENCY, DEFAULT_HOST_CONCURRENCY,
+                    POOL_CONNECTIONS, POOL_MAXSIZE, STREAM_CHUNK_SIZE, STREAM_DRAIN_BYTES,
+                    DEX_REPORT_BASE_URL, CHROME_STORE_BASE_URL)
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+# Chrome extension IDs, bare or after a chrome-extension:// or
+# chrome://extensions/?id= prefix. The prefixes are lookbehinds so a bare
+# match that swallowed part of a prefix cannot hide the ID after it.
+EXTENSION_ID_LENGTH = 32
+_extension_id_prefixes = ('chrome-extension://', 'chrome://extensions/?id=')
+_extension_id_pattern = re.compile(
+    '(?:' + '|'.join(f'(?<={re.escape(prefix)})' for prefix in _extension_id_prefixes) + ')'
+    r'[a-z0-9]{32}|\b[a-z0-9]{32}\b'
+)
+_extension_id_context = max(len(prefix) for prefix in _extension_id_prefixes) + 1
+
+# Chrome Web Store page markers, matched against the lowercased page.
+# Any "not available" marker means the item is not listed; otherwise at
+# least one extension page marker must be present.
+STORE_UNAVAILABLE_MARKERS = (b'item not found', b'not available')
+STORE_LISTING_MARKERS = (b'install', b'add to chrome', b'rating', b'stars', b'review')
+_store_marker_pattern = re.compile(
+    b'|'.join(re.escape(marker) for marker in STORE_UNAVAILABLE_MARKERS + STORE_LISTING_MARKERS)
+)
+_store_marker_overlap = max(len(marker) for marker in STORE_UNAVAILABLE_MARKERS + STORE_LISTING_MARKERS) - 1
 
 def get_random_user_agent():
     """
@@ -17,13 +56,118 @@ def get_random_user_agent():
     """
     return random.choice(USER_AGENTS)
 
-def make_request(url, max_retries=MAX_RETRIES):
+def get_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    Get the shared HTTP session, creating it on first use.
+
+    The session keeps connections alive in per-host pools, so repeated
+    requests to the same host reuse the TCP and TLS handshake. It is shared
+    by all threads; headers are passed per request. Responses are requested
+    compressed with every encoding urllib3 can decode here: gzip and
+    deflate, plus br with brotli installed and zstd with zstandard.
+
+    Args:
+        pool_connections (int): Number of per-host connection pools to keep
+        pool_maxsize (int): Maximum keep-alive connections per host
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+def close_session():
+    """
+    Close the shared HTTP session and its pooled connections.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_host_semaphore(url):
+    """
+    Get the semaphore limiting concurrent requests to the URL's host.
+
+    Args:
+        url (str): URL that is about to be requested
+
+    Returns:
+        threading.BoundedSemaphore: Semaphore shared by all requests to the host
+    """
+    host = urlparse(url).hostname or ''
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            limit = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            semaphore = threading.BoundedSemaphore(limit)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def _hold_host_slot(response, semaphore):
+    """
+    Keep a host slot until a streamed response is closed.
+
+    Reading the body of a streamed response then counts against the host's
+    concurrency limit like the request itself. On close, an unread body of
+    up to STREAM_DRAIN_BYTES is read to the end first, so the keep-alive
+    connection returns to the session pool instead of being dropped.
+
+    Args:
+        response (requests.Response): Response opened with stream=True
+        semaphore (threading.BoundedSemaphore): Host slot held by the response
+    """
+    close = response.close
+    released = threading.Event()
+
+    def close_and_release():
+        try:
+            drained = 0
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    drained += len(chunk)
+                    if drained > STREAM_DRAIN_BYTES:
+                        break  # Cheaper to drop the connection than to read on
+            except requests.RequestException:
+                pass  # Already consumed, or the connection failed
+            close()
+        finally:
+            if not released.is_set():
+                released.set()
+                semaphore.release()
+
+    response.close = close_and_release
+
+def make_request(url, max_retries=MAX_RETRIES, headers=None, stream=False, allow_redirects=True):
     """
     Make HTTP request with user agent rotation and retry logic.
 
+    Requests go through the shared keep-alive session from get_session()
+    and are paced by the host's HostLimiter. Connection errors and
+    RETRY_STATUS_CODES responses are retried after a jittered exponential
+    backoff, or after the server's Retry-After delay when it sends one.
+    Other HTTP errors are raised immediately. The host's concurrency slot
+    is held until the body has been read; for a streamed response that is
+    until the caller closes it.
+
     Args:
         url (str): URL to request
         max_retries (int): Maximum number of retries
+        headers (dict): Extra request headers, e.g. conditional request validators
+        stream (bool): Return as soon as headers arrive and let the caller read
+                       and close the body (preferably with a with block)
+        allow_redirects (bool): Follow redirects, or return the redirect itself
 
     Returns:
         requests.Response: Response object
@@ -31,23 +175,63 @@ def make_request(url, max_retries=MAX_RETRIES):
     Raises:
         requests.RequestException: If all retries fail
     """
-    headers = {'User-Agent': get_random_user_agent()}
+    headers = dict(headers or {})
+    headers['User-Agent'] = get_random_user_agent()
+    limiter = get_host_limiter(url)
+    host = limiter.host
 
     for attempt in range(max_retries):
+        if attempt:
+            profiler.count('retries')
+        with profiler.timer('rate_limit_wait'):
+            limiter.acquire()
+        retry_after = None
+
         try:
-            response = requests.get(
-                url,
-                headers=headers,
-                timeout=REQUEST_TIMEOUT,
-                allow_redirects=True
-            )
+            semaphore = get_host_semaphore(url)
+            semaphore.acquire()
+            try:
+                with profiler.timer(f"request {host}"):
+                    profiler.count('requests')
+                    response = get_session().get(
+                        url,
+                        headers=headers,
+                        timeout=REQUEST_TIMEOUT,
+                        allow_redirects=allow_redirects,
+                        stream=stream
+                    )
+            except BaseException:
+                semaphore.release()
+                raise
+            if stream:
+                _hold_host_slot(response, semaphore)
+            else:
+                semaphore.release()
+
+            if response.status_code in RETRY_STATUS_CODES:
+                profiler.count(f"status_{response.status_code}")
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                limiter.record_failure(retry_after, throttled=response.status_code in (429, 503))
             response.raise_for_status()
-            return response
+        except requests.HTTPError as e:
+            # Error responses are not returned, so their host slot is freed here
+            e.response.close()
+            if e.response.status_code not in RETRY_STATUS_CODES:
+                raise e
+            if attempt == max_retries - 1:
+                raise e
         except requests.RequestException as e:
+            profiler.count('request_errors')
+            limiter.record_failure()
             if attempt == max_retries - 1:
                 raise e
-            # Rotate user agent for next attempt
-            headers['User-Agent'] = get_random_user_agent()
+        else:
+            limiter.record_success()
+            return response
+
+        time.sleep(backoff_delay(attempt, retry_after))
+        # Rotate user agent for next attempt
+        headers['User-Agent'] = get_random_user_agent()
 
 def fetch_extension_report(extension_id):
     """
@@ -57,109 +241,262 @@ def fetch_extension_report(extension_id):
         extension_id (str): Chrome extension ID
 
     Returns:
-        tuple: (html_content, final_url)
+        tuple or None: (html_content, final_url), or None if
+                       dex.koi.security has no report for the ID
 
     Raises:
-        SystemExit: If 404 error or request fails
+        requests.RequestException: If the request fails
     """
-    base_url = "https://dex.koi.security/reports/chrome/"
-    url = f"{base_url}{extension_id}"
+    url = f"{DEX_REPORT_BASE_URL}{extension_id}"
 
     try:
         response = make_request(url)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+
+    html_content = response.text  # Decoded on every access, so decode once
+    profiler.count('bytes_downloaded', response.raw.tell())
 
-        # Check for 404 error in HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        error_404 = soup.find('h1', class_='text-4xl font-bold mb-4', string='404')
-        if error_404:
-            print("404")
-            print("Oops! Page not found")
-            raise SystemExit(1)
+    # Unknown IDs get the 404 page with a 200 status
+    if is_not_found_page(html_content):
+        return None
 
-        return response.text, response.url
-    except requests.RequestException as e:
-        print(f"Error fetching report: {e}")
-        raise SystemExit(1)
+    return html_content, response.url
 
-def parse_blog_for_extension_ids(blog_url):
+def resolve_report_url(extension_id):
     """
-    Parse a blog URL to extract Chrome extension IDs.
+    Find the URL of the latest report version without downloading the report.
+
+    The report URL redirects to the versioned URL of the latest report, so
+    the redirect alone (no body is read) tells which version
+    fetch_extension_report would end up at.
 
     Args:
-        blog_url (str): URL of the blog to parse
+        extension_id (str): Chrome extension ID
 
     Returns:
-        list: List of found extension IDs
+        str or None: Versioned report URL, or None if the report URL did not
+                     redirect or could not be fetched
     """
+    url = f"{DEX_REPORT_BASE_URL}{extension_id}"
+
     try:
-        response = make_request(blog_url)
+        with make_request(url, stream=True, allow_redirects=False) as response:
+            location = response.headers.get('Location')
+            if response.is_redirect and location:
+                return urljoin(url, location)
+    except requests.RequestException:
+        pass
 
-        # Regex patterns for Chrome extension IDs
-        # Pattern 1: Direct 32-character extension ID
-        id_pattern = r'\b[a-z0-9]{32}\b'
+    return None
 
-        # Pattern 2: chrome-extension://[id]
-        chrome_ext_pattern = r'chrome-extension://([a-z0-9]{32})'
+def scan_extension_ids(chunks):
+    """
+    Scan streamed text for Chrome extension IDs in a single pass.
 
-        # Pattern 3: chrome://extensions/?id=[id]
-        chrome_settings_pattern = r'chrome://extensions/\?id=([a-z0-9]{32})'
+    One compiled pattern covers bare 32-character IDs as well as IDs
+    following chrome-extension:// or chrome://extensions/?id=. Only the last
+    few characters of each chunk are carried into the next one, so matches
+    spanning chunk boundaries are found without holding the whole text.
 
-        text = response.text
-        found_ids = set()
+    Args:
+        chunks (iterable): Text chunks, in order
 
-        # Find all matches
-        found_ids.update(re.findall(id_pattern, text))
-        found_ids.update(re.findall(chrome_ext_pattern, text))
-        found_ids.update(re.findall(chrome_settings_pattern, text))
+    Returns:
+        dict: Extension ID -> list of character offsets where it was found
+    """
+    found = {}
+    buffer = ''
+    buffer_offset = 0  # Offset of buffer[0] in the whole text
+    scan_from = 0  # Matches starting before this index were already decided
+
+    for chunk in chunks:
+        buffer += chunk
+        # A match starting at s is decided once the character after it is known
+        decided = len(buffer) - EXTENSION_ID_LENGTH
+        for match in _extension_id_pattern.finditer(buffer, scan_from):
+            if match.start() >= decided:
+                break
+            found.setdefault(match.group(), []).append(buffer_offset + match.start())
+
+        # Keep enough context for lookbehind prefixes and word boundaries
+        keep_from = max(0, decided - _extension_id_context)
+        buffer = buffer[keep_from:]
+        buffer_offset += keep_from
+        scan_from = max(0, decided - keep_from)
+
+    for match in _extension_id_pattern.finditer(buffer, scan_from):
+        found.setdefault(match.group(), []).append(buffer_offset + match.start())
+
+    return found
+
+def iter_response_text(response, digest=None, raw_writer=None):
+    """
+    Decode a streamed response body incrementally.
 
-        return list(found_ids)
+    Args:
+        response (requests.Response): Response opened with stream=True
+        digest (hashlib hash): Hash to update with the raw body bytes (optional)
+        raw_writer (ArchiveWriter): Writer to pass the raw body bytes to (optional)
 
-    except requests.RequestException as e:
-        print(f"Error fetching blog {blog_url}: {e}")
-        return []
+    Yields:
+        str: Decoded text chunks
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+        if digest is not None:
+            digest.update(chunk)
+        if raw_writer is not None:
+            raw_writer.write(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+def fetch_blog_feed(blog_url, feed=None, archive=None):
+    """
+    Revalidate a blog feed and rescan it only if it changed.
 
-def check_chrome_store_status(extension_id):
+    A conditional request is sent with the ETag and Last-Modified validators
+    of the cached feed record. New content is streamed through
+    scan_extension_ids while its hash is computed; if the hash matches the
+    cached one the feed is reported as unchanged. Changed content is kept
+    in the archive, if one is given.
+
+    Args:
+        blog_url (str): URL of the blog to fetch
+        feed (dict): Cached feed record from a previous fetch (optional)
+        archive (HtmlArchive): Archive for the raw blog HTML (optional)
+
+    Returns:
+        tuple: (feed_record, offsets) where feed_record holds 'checked_at',
+               'etag', 'last_modified', 'content_hash' and the number of
+               'bytes' downloaded (plus the cached 'id_count' if the feed
+               is unchanged), and offsets maps each extension ID found to
+               its match offsets, or is None if the feed is unchanged
+
+    Raises:
+        requests.RequestException: If the feed could not be fetched
     """
-    Check if extension is listed in Chrome Web Store.
+    feed = feed or {}
+    headers = {}
+    if feed.get('etag'):
+        headers['If-None-Match'] = feed['etag']
+    if feed.get('last_modified'):
+        headers['If-Modified-Since'] = feed['last_modified']
+
+    with make_request(blog_url, headers=headers, stream=True) as response:
+        checked_at = time.time()
+
+        if response.status_code == 304 and feed:
+            return dict(feed, checked_at=checked_at, bytes=0), None
+
+        # The body is streamed to the archive as it is scanned, so it is
+        # never held in memory whole
+        digest = hashlib.sha256()
+        writer = archive.open_writer('blog', blog_url, response.url) if archive is not None else None
+        try:
+            offsets = scan_extension_ids(iter_response_text(response, digest, writer))
+        except BaseException:
+            if writer is not None:
+                writer.discard()
+            raise
+
+        record = {
+            'checked_at': checked_at,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': digest.hexdigest(),
+            'bytes': response.raw.tell()  # Bytes received, before decompression
+        }
+        profiler.count('bytes_downloaded', record['bytes'])
+
+    if feed and record['content_hash'] == feed.get('content_hash'):
+        if writer is not None:
+            writer.discard()
+        return dict(record, id_count=feed.get('id_count')), None
+    if writer is not None:
+        writer.commit()
+    return record, offsets
+
+def classify_store_page(chunks):
+    """
+    Classify a Chrome Web Store page from a stream of body chunks.
+
+    Every chunk is lowercased once and scanned for all markers in a single
+    regex pass. The tail of each chunk is carried over so markers spanning
+    chunk boundaries are found. Reading stops at the first "not available"
+    marker; a listed page can only be confirmed at the end of the body.
 
     Args:
-        extension_id (str): Chrome extension ID
+        chunks (iterable): Page body as bytes chunks
 
     Returns:
-        tuple: (is_listed, store_url)
+        bool: True if the page is a listed extension page
     """
-    store_url = f"https://chromewebstore.google.com/detail/{extension_id}"
+    has_listing_marker = False
+    tail = b''
 
-    try:
-        response = make_request(store_url)
+    for chunk in chunks:
+        window = tail + chunk.lower()
+        for match in _store_marker_pattern.finditer(window):
+            if match.group() in STORE_UNAVAILABLE_MARKERS:
+                return False
+            has_listing_marker = True
+        tail = window[-_store_marker_overlap:]
 
-        # Check if the final URL indicates an error page
-        if 'error' in response.url.lower() or 'empty-title' in response.url.lower():
-            return False, "https://chromewebstore.google.com/detail/error"
+    return has_listing_marker
+
+def fetch_chrome_store_status(extension_id):
+    """
+    Fetch the Chrome Web Store page of an extension and classify it.
+
+    The page is streamed: a redirect to an error page is detected from the
+    final URL before any of the body is read, and the body is read only
+    until classify_store_page reaches a decision.
+
+    Args:
+        extension_id (str): Chrome extension ID
 
-        # Check if the page indicates the extension is not found
-        soup = BeautifulSoup(response.text, 'html.parser')
+    Returns:
+        tuple: (is_listed, store_url)
+
+    Raises:
+        requests.RequestException: If the store page could not be fetched
+    """
+    store_url = f"{CHROME_STORE_BASE_URL}{extension_id}"
 
-        # Check for indicators of a real extension page
-        has_install_button = 'install' in response.text.lower() or 'add to chrome' in response.text.lower()
-        has_rating = 'rating' in response.text.lower() or 'stars' in response.text.lower()
-        has_reviews = 'review' in response.text.lower()
+    with make_request(store_url, stream=True) as response:
+        # Check if the final URL indicates an error page
+        final_url = response.url.lower()
+        if 'error' in final_url or 'empty-title' in final_url:
+            return False, f"{CHROME_STORE_BASE_URL}error"
 
-        # If the page lacks basic extension page elements, it's likely not a real extension
-        if not (has_install_button or has_rating or has_reviews):
-            return False, "https://chromewebstore.google.com/detail/error"
+        # Check for indicators of a real extension page and for error messages
+        is_listed = classify_store_page(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+        profiler.count('bytes_downloaded', response.raw.tell())
+        if not is_listed:
+            return False, f"{CHROME_STORE_BASE_URL}error"
 
-        # Look for the specific error message in the HTML
-        if 'this item is not available' in response.text.lower():
-            return False, "https://chromewebstore.google.com/detail/error"
+    # If none of the error conditions are met, assume it's listed
+    return True, store_url
 
-        # Additional check: look for other error indicators
-        if 'item not found' in response.text.lower() or 'not available' in response.text.lower():
-            return False, "https://chromewebstore.google.com/detail/error"
+def check_chrome_store_status(extension_id):
+    """
+    Check if extension is listed in Chrome Web Store.
 
-        # If none of the error conditions are met, assume it's listed
-        return True, store_url
+    Args:
+        extension_id (str): Chrome extension ID
 
+    Returns:
+        tuple: (is_listed, store_url)
+    """
+    try:
+        return fetch_chrome_store_status(extension_id)
     except requests.RequestException:
         # On network errors, treat as not listed
-        return False, "https://chromewebstore.google.com/detail/error"
+        return False, f"{CHROME_STORE_BASE_URL}error"
@@ -0,0 +1,344 @@
+"""
+Lookup service for Chrome Extension Analyzer
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import MAX_WORKERS, SERVICE_MAX_BATCH, SERVICE_FEED_CHECK_MINUTES, SERVICE_PURGE_HOURS
+from utils import validate_extension_ids
+from feeds import due_feeds, refresh_feeds
+from engine import lookup_extensions
+from output import format_json_output
+from profiling import profiler
+
+def result_to_json(result, extension_sources):
+    """
+    Format a lookup result for the service API.
+
+    Args:
+        result (dict): Lookup result from lookup_extensions
+        extension_sources (Mapping): Extension ID -> source blogs
+
+    Returns:
+        dict: format_json_output data plus the lookup 'status' (and the
+              'error' message of a failed fetch); reports that were not
+              found have null 'report_url' and 'extracted_data'
+    """
+    data = format_json_output(result['extension_id'], extension_sources, result['store_status'],
+                              result['extracted_data'], result['final_url'])
+    data['status'] = result['status']
+    if result['error'] is not None:
+        data['error'] = result['error']
+    return data
+
+class LookupService:
+    """
+    Warm lookup state shared by every request to the service.
+
+    The blog index, report cache, HTTP session and worker threads stay
+    resident between requests, so a lookup costs only the work the caches
+    cannot answer. Due feeds are refreshed in the background.
+    """
+
+    def __init__(self, blog_cache, feeds, report_cache=None, max_workers=MAX_WORKERS, offline=False,
+                 parser_pool=None, archive=None):
+        """
+        Args:
+            blog_cache (BlogCache): Blog intelligence cache
+            feeds (list): Feed dictionaries from load_feeds
+            report_cache (ReportCache): Report cache (optional)
+            max_workers (int): Extensions looked up concurrently per request
+            offline (bool): Answer from the caches only
+            parser_pool (ParserPool): Parser processes (optional)
+            archive (HtmlArchive): Archive for fetched report and blog HTML (optional)
+        """
+        self.blog_cache = blog_cache
+        self.feeds = feeds
+        self.feed_urls = [feed['url'] for feed in feeds]
+        self.report_cache = report_cache
+        self.max_workers = max(1, max_workers)
+        self.offline = offline
+        self.parser_pool = parser_pool
+        self.archive = archive
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers * 2)
+        self.started_at = time.time()
+        self.lookup_count = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def lookup(self, extension_ids):
+        """
+        Look up a batch of extensions.
+
+        Args:
+            extension_ids (list): Validated Chrome extension IDs
+
+        Returns:
+            list: Results from result_to_json, in input order
+        """
+        extension_sources = self.blog_cache.extension_sources(self.feed_urls)
+        results = [
+            result_to_json(result, extension_sources)
+            for result in lookup_extensions(extension_ids, self.max_workers, self.report_cache,
+                                            self.offline, executor=self.executor,
+                                            parser_pool=self.parser_pool, archive=self.archive)
+        ]
+        with self._lock:
+            self.lookup_count += len(results)
+        return results
+
+    def refresh_due_feeds(self):
+        """
+        Revalidate the feeds whose refresh interval has elapsed.
+
+        Returns:
+            int: Number of feeds that were due
+        """
+        with self._refresh_lock, self.blog_cache.refresh_lock():
+            feed_records = self.blog_cache.get_feeds(self.feed_urls)
+            due = due_feeds(self.feeds, feed_records)
+            if due:
+                refresh_feeds(self.blog_cache, due, feed_records, archive=self.archive)
+            return len(due)
+
+    def start_feed_refresher(self, interval_minutes=SERVICE_FEED_CHECK_MINUTES):
+        """
+        Check for due feeds periodically in a background thread.
+
+        The same thread purges long-expired report cache records every
+        SERVICE_PURGE_HOURS (the first purge is done when the cache is opened).
+
+        Args:
+            interval_minutes (float): Time between checks
+        """
+        def refresh_loop():
+            purged_at = time.time()
+            while not self._stopped.wait(interval_minutes * 60):
+                try:
+                    self.refresh_due_feeds()
+                except Exception as e:
+                    print(f"Error refreshing feeds: {e}")
+
+                if self.report_cache is not None and time.time() - purged_at >= SERVICE_PURGE_HOURS * 3600:
+                    purged_at = time.time()
+                    try:
+                        self.report_cache.purge_expired()
+                    except Exception as e:
+                        print(f"Error purging the report cache: {e}")
+
+        threading.Thread(target=refresh_loop, name='feed-refresher', daemon=True).start()
+
+    def health(self):
+        """
+        Describe the service state.
+
+        Returns:
+            dict: Uptime, lookups served, indexed extension IDs and, when
+                  profiling is enabled, the profile summary
+        """
+        with self._lock:
+            lookup_count = self.lookup_count
+        health = {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'lookups': lookup_count,
+            'indexed_extension_ids': self.blog_cache.count_extension_ids(),
+            'offline': self.offline
+        }
+        if profiler.enabled:
+            health['profile'] = profiler.summary()
+        return health
+
+    def close(self):
+        """
+        Stop the feed refresher, wait for running lookups and stop the parser processes.
+        """
+        self._stopped.set()
+        self.executor.shutdown(wait=True)
+        if self.parser_pool is not None:
+            self.parser_pool.close()
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the lookup service.
+
+    Routes:
+        GET  /lookup/<id>  look up one extension
+        POST /lookup       look up {"extension_ids": [...]} as one batch
+        GET  /health       service state
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.server.service.health())
+        elif self.path.startswith('/lookup/'):
+            results = self._lookup([self.path[len('/lookup/'):]])
+            if results is not None:
+                self._send_json(200, results[0])
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/lookup':
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            extension_ids = json.loads(body)['extension_ids']
+            if not isinstance(extension_ids, list):
+                raise TypeError('extension_ids must be a list')
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f"Expected {{\"extension_ids\": [...]}}: {e}"})
+            return
+
+        if len(extension_ids) > SERVICE_MAX_BATCH:
+            self._send_json(413, {'error': f"At most {SERVICE_MAX_BATCH} extension IDs per request"})
+            return
+
+        results = self._lookup(extension_ids)
+        if results is not None:
+            self._send_json(200, {'results': results})
+
+    def _lookup(self, extension_ids):
+        """
+        Validate and look up extension IDs, answering 400 if any is invalid.
+
+        Returns:
+            list or None: Results, or None if an error response was sent
+        """
+        try:
+            validated_ids = validate_extension_ids([str(ext_id) for ext_id in extension_ids])
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return None
+        return self.server.service.lookup(validated_ids)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """
+        Threaded HTTP server listening on a Unix socket.
+        """
+
+        daemon_threads = True
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a Unix socket left behind by a service that is no longer running.
+
+    Anything else at the path, including the socket of a running service,
+    is left alone and reported.
+
+    Args:
+        socket_path (str): Unix socket path
+
+    Returns:
+        bool: True if the path is free to listen on, False otherwise
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return True
+    if not stat.S_ISSOCK(mode):
+        print(f"Error: {socket_path} exists and is not a socket")
+        return False
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.remove(socket_path)  # Nobody is listening: left behind by a previous run
+        return True
+    except OSError as e:
+        print(f"Error: Could not check socket {socket_path}: {e}")
+        return False
+    finally:
+        probe.close()
+
+    print(f"Error: Another service is already listening on {socket_path}")
+    return False
+
+def _stop_on_sigterm(signum, frame):
+    """
+    Signal handler stopping the service the same way as Ctrl+C.
+    """
+    raise KeyboardInterrupt
+
+def run_service(service, host, port, socket_path=None):
+    """
+    Serve lookups until interrupted by Ctrl+C or SIGTERM.
+
+    Args:
+        service (LookupService): Warm service state
+        host (str): Address to listen on
+        port (int): TCP port to listen on
+        socket_path (str): Unix socket to listen on instead of TCP (optional)
+
+    Returns:
+        bool: False if the service could not start listening, True once it
+              has been stopped
+    """
+    if socket_path:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            print("Error: Unix sockets are not supported on this platform")
+            service.close()
+            return False
+        if not remove_stale_socket(socket_path):
+            service.close()
+            return False
+
+    try:
+        if socket_path:
+            server = UnixHTTPServer(socket_path, LookupRequestHandler)
+            address = f"unix:{socket_path}"
+        else:
+            server = ThreadingHTTPServer((host, port), LookupRequestHandler)
+            server.daemon_threads = True
+            address = f"http://{host}:{server.server_address[1]}"
+    except OSError as e:
+        # Typically the port is already in use
+        print(f"Error: Could not listen on {socket_path or f'{host}:{port}'}: {e}")
+        service.close()
+        return False
+
+    server.service = service
+    if not service.offline:
+        service.start_feed_refresher()
+
+    previous_handler = signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    print(f"Serving lookups on {address} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping lookup service...")
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return True
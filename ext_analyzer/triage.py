@@ -0,0 +1,137 @@
+"""
+Inventory triage for Chrome Extension Analyzer
+"""
+
+import sys
+
+from config import BLOOM_FILE, BLOOM_ERROR_RATE, TRIAGE_CHUNK_SIZE, TRIAGE_SCREENED_LIMIT
+from bloom import BloomFilter
+
+# Byte translation table lowercasing letters and turning every other
+# non-alphanumeric byte into a space, so an inventory chunk in any text
+# format (CSV, TSV, JSON, logs ...) splits into alphanumeric tokens in C
+_TOKEN_TABLE = bytes(
+    byte + 32 if 65 <= byte <= 90 else byte if 48 <= byte <= 57 or 97 <= byte <= 122 else 32
+    for byte in range(256)
+)
+
+def load_known_id_filter(blog_cache, path=BLOOM_FILE, error_rate=BLOOM_ERROR_RATE):
+    """
+    Load the Bloom filter of indexed extension IDs, rebuilding it if stale.
+
+    The filter file records the blog index fingerprint it was built from;
+    it is rebuilt from the index whenever a feed was added, removed or
+    rescanned since.
+
+    Args:
+        blog_cache (BlogCache): Blog intelligence cache
+        path (str): Filter file
+        error_rate (float): False positive rate of a rebuilt filter
+
+    Returns:
+        tuple: (BloomFilter, rebuilt) where rebuilt is True if the filter
+               was built from the index
+    """
+    fingerprint = blog_cache.index_fingerprint()
+    bloom_filter = BloomFilter.load(path)
+    if bloom_filter is not None and bloom_filter.fingerprint == fingerprint:
+        return bloom_filter, False
+
+    bloom_filter = BloomFilter.for_capacity(blog_cache.count_extension_ids(), error_rate, fingerprint)
+    for extension_id in blog_cache.iter_extension_ids():
+        bloom_filter.add(extension_id)
+    try:
+        bloom_filter.save(path)
+    except OSError as e:
+        print(f"Warning: Could not save Bloom filter to {path}: {e}")
+    return bloom_filter, True
+
+def iter_inventory_chunks(path, chunk_size=TRIAGE_CHUNK_SIZE):
+    """
+    Read an inventory file in large chunks that end on line boundaries.
+
+    Args:
+        path (str): Inventory file, or '-' for standard input
+        chunk_size (int): Bytes read at a time
+
+    Yields:
+        bytes: Whole lines of the inventory
+    """
+    stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        carry = b''
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            data = carry + data
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                carry = data  # No line break yet
+                continue
+            carry = data[end:]
+            yield data[:end]
+        if carry:
+            yield carry
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+def triage_inventory(path, blog_cache, bloom_filter, stats=None):
+    """
+    Screen an inventory for extension IDs found in the blogs.
+
+    The inventory is streamed, so its size does not matter. Every
+    32-character alphanumeric token is taken as an extension ID and tested
+    against the in-memory Bloom filter; only the few filter hits are
+    confirmed against the index, which drops the filter's false positives.
+
+    Args:
+        path (str): Inventory file, or '-' for standard input
+        blog_cache (BlogCache): Blog intelligence cache
+        bloom_filter (BloomFilter): Filter from load_known_id_filter
+        stats (dict): Receives 'lines', 'ids', 'candidates', 'hits' and
+                      'false_positives' counts (optional)
+
+    Yields:
+        tuple: (extension_id, blogs) for every indexed ID, once, sorted
+               within each chunk; blogs maps blog URL -> match offsets
+    """
+    if stats is None:
+        stats = {}
+    for key in ('lines', 'ids', 'candidates', 'hits', 'false_positives'):
+        stats[key] = 0
+
+    # Inventories repeat the same extensions across many machines; IDs
+    # already screened are skipped with set operations instead of being
+    # tested against the filter again
+    screened = set()
+    emitted = set()
+    chunk = b''
+    for chunk in iter_inventory_chunks(path):
+        stats['lines'] += chunk.count(b'\n')
+        extension_ids = [token for token in chunk.translate(_TOKEN_TABLE).split() if len(token) == 32]
+        stats['ids'] += len(extension_ids)
+
+        new_ids = set(extension_ids) - screened
+        if len(screened) + len(new_ids) > TRIAGE_SCREENED_LIMIT:
+            screened.clear()  # Bound the memory of huge unique inventories
+        screened |= new_ids
+
+        candidates = sorted(
+            extension_id for extension_id in (token.decode('ascii') for token in new_ids)
+            if extension_id not in emitted and extension_id in bloom_filter
+        )
+        stats['candidates'] += len(candidates)
+
+        for extension_id in candidates:
+            blogs = blog_cache.lookup(extension_id)
+            if not blogs:
+                stats['false_positives'] += 1
+                continue
+            emitted.add(extension_id)
+            stats['hits'] += 1
+            yield extension_id, blogs
+
+    if chunk and not chunk.endswith(b'\n'):
+        stats['lines'] += 1  # Last line has no line break
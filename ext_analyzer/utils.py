@@ -2,6 +2,7 @@
 Utility functions for Chrome Extension Analyzer
 """
 
+import os
 import re
 import sys
 from config import EXTENSION_ID_PATTERN
@@ -83,3 +84,122 @@ def sanitize_url(url):
         raise ValueError(f"Invalid URL format: '{url}'. Must start with http:// or https://")
 
     return url
+
+class ExtensionIdSet:
+    """
+    Compact set of extension IDs.
+
+    IDs are stored as base-36 integers rather than 32-character strings,
+    roughly halving the memory used to deduplicate very large inputs.
+    """
+
+    def __init__(self, extension_ids=()):
+        self._keys = set()
+        for extension_id in extension_ids:
+            self.add(extension_id)
+
+    def add(self, extension_id):
+        """
+        Add a validated extension ID.
+
+        Args:
+            extension_id (str): Validated extension ID
+        """
+        self._keys.add(int(extension_id, 36))
+
+    def __contains__(self, extension_id):
+        return int(extension_id, 36) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+def read_extension_id_lines(path):
+    """
+    Lazily read extension IDs from a file, one per line.
+
+    Blank lines and lines starting with '#' are skipped. Only the first
+    comma- or whitespace-separated field of a line is used, so simple CSV
+    inventories can be read directly.
+
+    Args:
+        path (str): File path, or '-' for standard input
+
+    Yields:
+        tuple: (line_number, raw_extension_id)
+    """
+    if path == '-':
+        stream = sys.stdin
+    else:
+        stream = open(path, 'r', encoding='utf-8', errors='replace')
+
+    try:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield line_number, line.replace(',', ' ').split()[0]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def iter_unique_extension_ids(lines, seen=None):
+    """
+    Validate and deduplicate extension IDs on the fly.
+
+    Invalid IDs are reported and skipped instead of aborting the run.
+
+    Args:
+        lines (iterable): (line_number, raw_extension_id) tuples
+        seen (ExtensionIdSet): IDs to skip, updated with every ID yielded
+
+    Yields:
+        str: Validated extension IDs not seen before
+    """
+    if seen is None:
+        seen = ExtensionIdSet()
+
+    for line_number, raw_id in lines:
+        try:
+            extension_id = validate_extension_id(raw_id)
+        except ValueError as e:
+            print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+            continue
+
+        if extension_id in seen:
+            continue
+        seen.add(extension_id)
+        yield extension_id
+
+def load_checkpoint(path):
+    """
+    Load the IDs completed by a previous run.
+
+    Args:
+        path (str): Checkpoint file
+
+    Returns:
+        ExtensionIdSet: Completed extension IDs, empty if there is no checkpoint
+    """
+    completed = ExtensionIdSet()
+    if not path or not os.path.exists(path):
+        return completed
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if re.match(EXTENSION_ID_PATTERN, line):
+                completed.add(line)
+
+    return completed
+
+def open_checkpoint(path):
+    """
+    Open a checkpoint file for appending completed IDs.
+
+    Args:
+        path (str): Checkpoint file
+
+    Returns:
+        file: Line-buffered file object
+    """
+    return open(path, 'a', encoding='utf-8', buffering=1)